@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+from qr.encoder import encode_bytes
+
+# Synthetic corpus: QR codes made by the project's own encoder, clean and degraded
+
+# (name, text, EC level): every mode and a range of versions
+PAYLOADS = [
+    ('numeric', '3141592653589793238462643383279502884197', 'M'),
+    ('alphanumeric', 'HTTPS://GITHUB.COM/VOAIDESR/QR', 'Q'),
+    ('byte', 'Get Muxed', 'H'),
+    ('url', 'https://cs.unibuc.ro/~crusu/asc/index.html?lang=ro&page=3', 'M'),
+    ('mixed', 'Order 00042137: 12x WIDGET-7 shipped to Bucuresti, tracking 9400111899223197428490', 'L'),
+    ('long', 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 6, 'M'),
+]
+
+VARIANTS = ('clean', 'scaled', 'rotated', 'noisy')
+
+def degrade(image: np.ndarray, variant: str, rng: np.random.Generator) -> np.ndarray:
+    """
+    A variant of a rendered code:
+      - clean:   as rendered
+      - scaled:  shrunk to half size
+      - rotated: turned 5 to 25 degrees on a white canvas
+      - noisy:   blurred with added Gaussian noise
+    """
+    if variant == 'clean':
+        return image
+    if variant == 'scaled':
+        return cv2.resize(image, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+    if variant == 'rotated':
+        h, w = image.shape[:2]
+        pad = max(h, w) // 4
+        image = cv2.copyMakeBorder(image, pad, pad, pad, pad, cv2.BORDER_CONSTANT, value=(255, 255, 255))
+        center = (image.shape[1] / 2, image.shape[0] / 2)
+        rotation = cv2.getRotationMatrix2D(center, float(rng.uniform(5, 25)), 1.0)
+        return cv2.warpAffine(image, rotation, image.shape[1::-1], flags=cv2.INTER_LINEAR,
+                              borderValue=(255, 255, 255))
+    if variant == 'noisy':
+        image = cv2.GaussianBlur(image, (5, 5), 0).astype(np.float32)
+        image += rng.normal(0, 20, image.shape)
+        return np.clip(image, 0, 255).astype(np.uint8)
+    raise ValueError(f"Unknown variant: {variant!r}, expected one of {', '.join(VARIANTS)}")
+
+def build_corpus(variants: tuple = VARIANTS, seed: int = 0) -> list[dict]:
+    """
+    Every payload in every variant, as PNG bytes.
+    Returns a list of {'name', 'variant', 'text', 'ec_level', 'png'}; the same seed gives the same corpus.
+    """
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for name, text, ec_level in PAYLOADS:
+        rendered = cv2.imdecode(np.frombuffer(encode_bytes(text, 'rgb', ec_level=ec_level), dtype=np.uint8),
+                                cv2.IMREAD_COLOR)
+        for variant in variants:
+            ok, png = cv2.imencode('.png', degrade(rendered, variant, rng))
+            if not ok:
+                raise ValueError(f"Could not encode the {variant} {name} image")
+            corpus.append({'name': name, 'variant': variant, 'text': text, 'ec_level': ec_level,
+                           'png': png.tobytes()})
+    return corpus
@@ -0,0 +1,255 @@
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import click
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# always measure the checked out tree, not an installed copy of the package
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import cv2
+import numpy as np
+from corpus import PAYLOADS, VARIANTS, build_corpus
+from qr.builder import QRCodeBuilder
+from qr.decoder import (assemble_structured_append, correct_codewords, decode_data, detect_qr_codes,
+                        find_qr_in_image, full_decode, load_image, qr_candidates, read_grid)
+from qr.encoder import Encoder, encode_bytes
+from qr.visualizer import QR_Visualizer
+
+# Timing of every encode and decode stage on a synthetic corpus, stored as JSON to compare commits
+
+RESULTS_FORMAT = 1
+
+def encode_stages() -> dict:
+    """
+    Every encode stage on every payload, each isolated from the previous ones (their results are
+    prepared beforehand). A stage is a list of (call, expected result or None).
+    """
+    stages = {name: [] for name in ('encode.segment', 'encode.codewords', 'encode.place', 'encode.mask',
+                                    'encode.render', 'encode.png', 'encode.end_to_end')}
+    for _, text, ec_level in PAYLOADS:
+        encoder = Encoder(text, ec_level)
+        encoded = encoder.get_encoded()
+        builder = QRCodeBuilder(encoder.version, ec_level)
+        builder.load_stream_in_qr(encoded)
+        unmasked = builder.get_matrix().copy()
+        masked = QRCodeBuilder(encoder.version, ec_level)
+        masked.load_stream_in_qr(encoded)
+        masked.apply_best_mask()
+
+        def mask(builder=builder, unmasked=unmasked):
+            # apply_best_mask works in place: start again from the unmasked matrix (a small copy)
+            builder.qr_matrix = unmasked.copy()
+            return builder.apply_best_mask('exhaustive')
+
+        def place(version=encoder.version, ec_level=ec_level, encoded=encoded):
+            base = QRCodeBuilder(version, ec_level)
+            base.load_stream_in_qr(encoded)
+            return base
+
+        stages['encode.segment'].append((lambda text=text, ec_level=ec_level: Encoder(text, ec_level), None))
+        stages['encode.codewords'].append((encoder.get_encoded, None))
+        stages['encode.place'].append((place, None))
+        stages['encode.mask'].append((mask, None))
+        stages['encode.render'].append((lambda masked=masked: QR_Visualizer(masked).write_image(), None))
+        stages['encode.png'].append((lambda masked=masked: QR_Visualizer(masked).to_bytes('rgb'), None))
+        stages['encode.end_to_end'].append(
+            (lambda text=text, ec_level=ec_level: encode_bytes(text, 'rgb', ec_level=ec_level), None))
+    return stages
+
+def decode_stages(corpus: list[dict]) -> dict:
+    """
+    Every decode stage on every image, by variant. The isolated stages start from the result
+    of the previous one, prepared beforehand:
+      - load:       PNG bytes to a BGR array
+      - candidates: qr_candidates, the regions of the grayscale image that may hold a code
+      - grid:       read_grid, the finder search and module sampling of the cropped code
+      - correct:    correct_codewords, unmasking, deinterleaving and Reed-Solomon on the grid
+      - parse:      decode_data, the segments of the corrected data codewords
+    and the public entry points, which chain several stages:
+      - locate:     find_qr_in_image (candidates and grid), the cropped QR regions
+      - symbols:    full_decode of the regions found beforehand (grid, correct and parse)
+      - end_to_end: find_qr_in_image and full_decode, as the decode command does
+      - detect:     detect_qr_codes, as decode-batch does
+    """
+    stages = {}
+    for item in corpus:
+        png, text, variant = item['png'], item['text'], item['variant']
+        gray = cv2.cvtColor(load_image(png), cv2.COLOR_BGR2GRAY)
+        rois = find_qr_in_image(png, find_all=True)[0]
+        # the inputs of the isolated stages: the region, grid and codewords of the largest code
+        roi = rois[0] if rois else None
+        symbol = read_grid(roi) if roi is not None else None
+        grid = symbol.to_grid() if symbol is not None else None
+        version = symbol.version if symbol is not None else None
+        codewords = correct_codewords(grid, version)[0] if grid is not None else None
+
+        def end_to_end(png=png):
+            return full_decode(find_qr_in_image(png, find_all=True)[0])
+
+        def detect(png=png):
+            symbols = detect_qr_codes(png)[0]
+            return assemble_structured_append(symbols)
+
+        calls = {
+            'load': (lambda png=png: load_image(png), None),
+            'candidates': (lambda gray=gray: len(qr_candidates(gray)) > 0, True),
+        }
+        # a stage whose input couldn't be prepared is left out for this image
+        if roi is not None:
+            calls['grid'] = (lambda roi=roi: read_grid(roi) is not None, True)
+        if grid is not None:
+            calls['correct'] = (lambda grid=grid, version=version: correct_codewords(grid, version)[0] is not None,
+                                True)
+        if codewords is not None:
+            calls['parse'] = (lambda codewords=codewords, version=version: decode_data(codewords, version), text)
+        calls.update({
+            'locate': (lambda png=png: len(find_qr_in_image(png, find_all=True)[0]) > 0, True),
+            'symbols': (lambda rois=rois: full_decode(rois), text),
+            'end_to_end': (end_to_end, text),
+            'detect': (detect, text),
+        })
+        for stage, call in calls.items():
+            stages.setdefault(f'decode.{stage}/{variant}', []).append(call)
+    return stages
+
+def time_stage(calls: list[tuple], repeat: int) -> dict:
+    """
+    Time every call `repeat` times, after one warm-up call (which fills the layout caches).
+    Times are per call, in milliseconds; 'total_ms' is the sum of the per-call medians, i.e. one
+    pass over the corpus. 'success' is the share of calls giving the expected result, if there is one.
+    """
+    samples, medians, checked, succeeded = [], [], 0, 0
+    for call, expected in calls:
+        result = call()
+        if expected is not None:
+            checked += 1
+            succeeded += result == expected
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            times.append((time.perf_counter() - start) * 1000)
+        samples.extend(times)
+        medians.append(statistics.median(times))
+
+    return {
+        'calls': len(calls),
+        'repeat': repeat,
+        'median_ms': round(statistics.median(samples), 4),
+        'mean_ms': round(statistics.fmean(samples), 4),
+        'min_ms': round(min(samples), 4),
+        'max_ms': round(max(samples), 4),
+        'total_ms': round(sum(medians), 4),
+        'success': round(succeeded / checked, 4) if checked else None,
+    }
+
+def git_revision() -> dict:
+    # the commit being measured, None outside a git checkout
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True)
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+    return {'commit': commit.stdout.strip(), 'dirty': bool(status.stdout.strip())}
+
+def environment() -> dict:
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        **git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+@click.group()
+def cli():
+    """Benchmarks of the QR encoder and decoder"""
+    pass
+
+@click.command()
+@click.option("--out", "-o", type=click.File("w", encoding="utf-8"), default="-",
+              help="JSON file for the results, stdout by default")
+@click.option("--repeat", type=click.IntRange(1), default=5, show_default=True,
+              help="Timed calls per corpus item")
+@click.option("--stage", "patterns", multiple=True,
+              help="Only the stages matching this pattern, e.g. 'encode.*' or '*/rotated' (repeatable)")
+@click.option("--variant", "variants", type=click.Choice(VARIANTS), multiple=True,
+              help="Only these image variants (repeatable), all by default")
+@click.option("--seed", type=int, default=0, show_default=True, help="Seed of the synthetic corpus")
+def run(out, repeat: int, patterns: tuple[str], variants: tuple[str], seed: int) -> None:
+    """Time every stage and write the results as JSON"""
+    corpus = build_corpus(variants or VARIANTS, seed)
+    stages = {**encode_stages(), **decode_stages(corpus)}
+    if patterns:
+        stages = {name: calls for name, calls in stages.items()
+                  if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)}
+        if not stages:
+            raise click.ClickException(f"No stage matches {', '.join(patterns)}")
+
+    results = {}
+    for name, calls in stages.items():
+        results[name] = time_stage(calls, repeat)
+        success = results[name]['success']
+        click.echo(f"{name:<28} {results[name]['median_ms']:>10.3f} ms"
+                   f"{'' if success is None else f'  {success:.0%} ok'}", err=True)
+
+    report = {
+        'format': RESULTS_FORMAT,
+        'environment': environment(),
+        'corpus': {'payloads': len(PAYLOADS), 'variants': list(variants or VARIANTS), 'seed': seed},
+        'stages': results,
+    }
+    json.dump(report, out, indent=2)
+    out.write("\n")
+
+@click.command()
+@click.argument("base", type=click.File("r", encoding="utf-8"))
+@click.argument("head", type=click.File("r", encoding="utf-8"))
+@click.option("--threshold", type=click.FloatRange(0), default=10.0, show_default=True,
+              help="Change of the median time, in percent, reported as a regression or improvement")
+def compare(base, head, threshold: float) -> None:
+    """Compare two result files; exits with status 1 if a stage got slower or less reliable"""
+    base, head = json.load(base), json.load(head)
+    for report in (base, head):
+        if report.get('format') != RESULTS_FORMAT:
+            raise click.ClickException(f"Unsupported results format: {report.get('format')!r}")
+    click.echo(f"base: {base['environment']['commit']}  head: {head['environment']['commit']}")
+
+    regressions = 0
+    for name in sorted(base['stages'].keys() | head['stages'].keys()):
+        if name not in base['stages'] or name not in head['stages']:
+            click.echo(f"{name:<28} only in {'base' if name in base['stages'] else 'head'}")
+            continue
+        old, new = base['stages'][name], head['stages'][name]
+        change = (new['median_ms'] / old['median_ms'] - 1) * 100 if old['median_ms'] else 0.0
+        verdict = ''
+        if change > threshold:
+            verdict = 'slower'
+            regressions += 1
+        elif change < -threshold:
+            verdict = 'faster'
+        if old['success'] is not None and new['success'] is not None and new['success'] < old['success']:
+            verdict = f"{verdict} success {old['success']:.0%} -> {new['success']:.0%}".strip()
+            regressions += 1
+        click.echo(f"{name:<28} {old['median_ms']:>10.3f} {new['median_ms']:>10.3f} ms {change:>+8.1f}%  {verdict}")
+
+    if regressions:
+        click.echo(f"{regressions} regression(s) beyond {threshold}%", err=True)
+        sys.exit(1)
+
+cli.add_command(run)
+cli.add_command(compare)
+
+if __name__ == "__main__":
+    cli()
@@ -1,6 +1,14 @@
+import json
+import time
+from collections import Counter
 import click
+import qr.batch
 import qr.decoder
+from qr.batch import INPUT_FORMATS, input_format_for, read_payloads
+from qr.cache import DecodeCache, image_symbols
+from qr.stream import StreamDecoder, read_frames
 from qr.encoder import encode_text
+from qr.builder import parse_mask_policy
 from qr.gui import main
 
 @click.group()
@@ -10,24 +18,164 @@ def cli():
 
 @click.command()
 @click.argument("text")
-def encode(text: str) -> None:
+@click.option("--mask", "mask_policy", default="exhaustive", show_default=True,
+              help="Mask selection policy: exhaustive, heuristic (faster, may pick a mask with a "
+                   "higher full penalty) or fixed=N (0-7)")
+@click.option("--ec-level", type=click.Choice(["L", "M", "Q", "H"], case_sensitive=False), default="M",
+              show_default=True, help="Error correction level")
+@click.option("--version", "version", type=click.IntRange(1, 40), default=None,
+              help="QR version (1-40), by default the smallest one the text fits in")
+@click.option("--structured-append", is_flag=True,
+              help="Split text that doesn't fit in one symbol over up to 16 symbols (qr_code_1.png, ...)")
+@click.option("--output", type=click.Choice(["rgb", "mono", "svg", "bits"]), default="rgb", show_default=True,
+              help="Output format: RGB PNG, 1-bit PNG, SVG or packed module bits")
+@click.option("--module-size", type=click.IntRange(1), default=None,
+              help="Pixels per module, by default as large as fit in 864px")
+def encode(text: str, mask_policy: str, ec_level: str, version: int, structured_append: bool,
+           output: str, module_size: int) -> None:
     """Encode data into a QR code"""
-    encode_text(text)
+    try:
+        parse_mask_policy(mask_policy)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--mask")
+    try:
+        encode_text(text, mask_policy, ec_level.upper(), version, structured_append, output, module_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
 
 @click.command()
-@click.argument("image_path")
-def decode(image_path: str) -> None:
-    """Decode a QR code"""
-    qrCode = qr.decoder.find_qr_in_image(image_path)[0]
-    print(qr.decoder.full_decode(qrCode))
+@click.argument("image_paths", nargs=-1, required=True)
+@click.option("--workers", type=click.IntRange(1), default=1, show_default=True,
+              help="Threads decoding the symbols in parallel")
+@click.option("--cache", "cache_dir", default=None,
+              help="Directory of cached results, looked up by image content before decoding")
+@click.option("--cache-size", type=click.IntRange(1), default=256, show_default=True,
+              help="Size limit of the cache directory in MB")
+def decode(image_paths: tuple[str], workers: int, cache_dir: str, cache_size: int) -> None:
+    """Decode QR codes; the symbols of a Structured Append sequence are reassembled"""
+    if cache_dir:
+        cache = DecodeCache(cache_dir, disk_limit=cache_size * 2**20)
+        symbols = []
+        try:
+            for image_path in image_paths:
+                symbols.extend(image_symbols(image_path, cache)[0])
+        except ValueError as e:
+            raise click.ClickException(f"{image_path}: {e}")
+        except OSError:
+            raise click.ClickException(f"{image_path}: Could not read the image")
+        print(qr.decoder.assemble_structured_append(symbols))
+        print_cache_stats(cache.stats)
+        return
 
+    qrCodes = []
+    for image_path in image_paths:
+        try:
+            qrCodes.extend(qr.decoder.find_qr_in_image(image_path, find_all=True)[0])
+        except ValueError as e:
+            raise click.ClickException(f"{image_path}: {e}")
+    print(qr.decoder.full_decode(qrCodes, workers))
+
+
+def print_cache_stats(stats: dict) -> None:
+    hits = stats['memory_hits'] + stats['disk_hits']
+    click.echo(f"Cache: {hits} hits ({stats['memory_hits']} memory, {stats['disk_hits']} disk), "
+               f"{stats['misses']} misses", err=True)
+
+@click.command("encode-batch")
+@click.argument("input_file", type=click.File("r", encoding="utf-8"))
+@click.option("--out", "-o", required=True,
+              help="Output directory, or a .zip file to write all the codes into one archive")
+@click.option("--format", "input_format", type=click.Choice(list(INPUT_FORMATS)), default=None,
+              help="Input format, by default from the file extension (.csv, .jsonl, otherwise lines)")
+@click.option("--workers", type=click.IntRange(1), default=None,
+              help="Encoder processes, by default one per CPU")
+@click.option("--mask", "mask_policy", default="exhaustive", show_default=True,
+              help="Mask selection policy: exhaustive, heuristic (faster, may pick a mask with a "
+                   "higher full penalty) or fixed=N (0-7)")
+@click.option("--ec-level", type=click.Choice(["L", "M", "Q", "H"], case_sensitive=False), default="M",
+              show_default=True, help="Error correction level")
+@click.option("--output", type=click.Choice(["rgb", "mono", "svg", "bits"]), default="rgb", show_default=True,
+              help="Output format: RGB PNG, 1-bit PNG, SVG or packed module bits")
+@click.option("--module-size", type=click.IntRange(1), default=None,
+              help="Pixels per module, by default as large as fit in 864px")
+def encode_batch(input_file, out: str, input_format: str, workers: int, mask_policy: str, ec_level: str,
+                 output: str, module_size: int) -> None:
+    """Encode every payload of a file (or - for stdin) into QR codes"""
+    try:
+        parse_mask_policy(mask_policy)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--mask")
+    if input_format is None:
+        input_format = input_format_for(input_file.name)
+
+    try:
+        stats = qr.batch.encode_batch(read_payloads(input_file, input_format), out, output, workers,
+                                      mask_policy=mask_policy, ec_level=ec_level.upper(), module_size=module_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    for line, name, error in stats['errors']:
+        click.echo(f"Line {line}{f' ({name})' if name else ''}: {error}", err=True)
+    for line, name, filename in stats['renamed']:
+        click.echo(f"Line {line}: the name {name!r} is already taken, written as {filename}", err=True)
+    click.echo(f"Encoded {stats['encoded']} codes in {stats['seconds']:.2f}s "
+               f"({stats['per_second']:.1f} codes/s), {stats['failed']} failed")
+
+@click.command("decode-batch")
+@click.argument("sources", nargs=-1, required=True)
+@click.option("--out", "-o", type=click.File("w", encoding="utf-8"), default="-",
+              help="JSONL file for the results, stdout by default")
+@click.option("--workers", type=click.IntRange(1), default=None,
+              help="Decoder processes, by default one per CPU")
+@click.option("--cache", "cache_dir", default=None,
+              help="Directory of cached results, looked up by image content before decoding")
+@click.option("--cache-size", type=click.IntRange(1), default=256, show_default=True,
+              help="Size limit of the cache directory in MB")
+def decode_batch(sources: tuple[str], out, workers: int, cache_dir: str, cache_size: int) -> None:
+    """Decode every image of directories, glob patterns or files into JSONL records"""
+    start = time.perf_counter()
+    images = failed = 0
+    tiers = Counter()
+    for record in qr.batch.decode_batch(qr.batch.image_paths(sources), workers,
+                                        cache_dir=cache_dir, cache_limit=cache_size * 2**20):
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        images += 1
+        failed += record['error'] is not None
+        tiers[record['cache']] += 1
+    seconds = time.perf_counter() - start
+    click.echo(f"Decoded {images - failed} of {images} images in {seconds:.2f}s "
+               f"({images / seconds if seconds else 0:.1f} images/s), {failed} failed", err=True)
+    if cache_dir:
+        print_cache_stats({'memory_hits': tiers['memory'], 'disk_hits': tiers['disk'], 'misses': tiers['miss']})
+
+@click.command("decode-stream")
+@click.argument("source")
+@click.option("--all", "show_all", is_flag=True, help="Print every read, not only the first one of each payload")
+@click.option("--redetect-every", type=click.IntRange(0), default=30, show_default=True,
+              help="Search the whole frame every N frames for new codes (0: only when tracking is lost)")
+def decode_stream(source: str, show_all: bool, redetect_every: int) -> None:
+    """Decode the QR codes of a video file (or a camera index)"""
+    decoder = StreamDecoder(dedupe=not show_all, redetect_every=redetect_every)
+    start = time.perf_counter()
+    try:
+        for frame in read_frames(source):
+            for symbol in decoder.process(frame):
+                click.echo(f"[frame {symbol['frame']}] {symbol['text']}")
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    seconds = time.perf_counter() - start
+    click.echo(f"{decoder.frames} frames in {seconds:.2f}s ({decoder.frames / seconds if seconds else 0:.1f} fps), "
+               f"{decoder.full_scans} full detections, {decoder.tracked_reads} tracked reads", err=True)
 
 @click.command()
 def gui():
     main()
 
 cli.add_command(encode)
+cli.add_command(encode_batch)
 cli.add_command(decode)
+cli.add_command(decode_batch)
+cli.add_command(decode_stream)
 cli.add_command(gui)
 
 if __name__ == "__main__":
@@ -0,0 +1,254 @@
+import collections
+import csv
+import functools
+import glob
+import io
+import itertools
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from qr.cache import image_symbols, open_cache
+from qr.decoder import assemble_structured_append
+from qr.encoder import encode_bytes
+from qr.visualizer import OUTPUT_FORMATS
+
+# Encoding and decoding many codes in one run, spread over a pool of processes
+
+INPUT_FORMATS = ('lines', 'csv', 'jsonl')
+
+def input_format_for(path: str) -> str:
+    # guess the input format from the file extension, plain lines by default
+    extension = os.path.splitext(path)[1].lower()
+    return {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}.get(extension, 'lines')
+
+def read_payloads(stream: io.TextIOBase, input_format: str = 'lines'):
+    """
+    Yield (line, name, text) for every payload in the stream: the line number it was read from
+    (the last line of a multi-line CSV record), and a name that is None unless the input has one.
+      - lines: every non-empty line is a payload
+      - csv:   a header row, payloads in the 'text' column (or the first one), optional 'name' column
+      - jsonl: one JSON string, or object with 'text' and an optional 'name', per line
+    """
+    if input_format == 'lines':
+        for number, line in enumerate(stream, 1):
+            line = line.rstrip('\r\n')
+            if line:
+                yield number, None, line
+    elif input_format == 'csv':
+        reader = csv.DictReader(stream)
+        column = 'text' if 'text' in (reader.fieldnames or []) else (reader.fieldnames or [None])[0]
+        for row in reader:
+            if row.get(column):
+                yield reader.line_num, row.get('name') or None, row[column]
+    elif input_format == 'jsonl':
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                yield number, None, record
+            elif isinstance(record, dict) and isinstance(record.get('text'), str):
+                yield number, record.get('name'), record['text']
+            else:
+                raise ValueError(f"Line {number}: expected a string or an object with a 'text' field")
+    else:
+        raise ValueError(f"Unknown input format: {input_format!r}, expected one of {', '.join(INPUT_FORMATS)}")
+
+def encode_job(job: tuple) -> tuple:
+    # (index, line, name, text, options) -> (index, line, name, data or None, error or None)
+    index, line, name, text, options = job
+    try:
+        return index, line, name, encode_bytes(text, **options), None
+    except ValueError as e:
+        return index, line, name, None, str(e)
+
+def encode_chunk(jobs: list[tuple]) -> list[tuple]:
+    # runs in a worker process: a few jobs per task, to save on the round trips
+    return [encode_job(job) for job in jobs]
+
+class BatchWriter:
+    """
+    Writes the encoded files to a directory, or into a single .zip archive.
+    """
+    def __init__(self, out: str) -> None:
+        self.out = out
+        self.archive = None
+        if out.lower().endswith('.zip'):
+            parent = os.path.dirname(out)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            # the images are already compressed, so they are only stored
+            self.archive = zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_STORED)
+        else:
+            os.makedirs(out, exist_ok=True)
+
+    def write(self, filename: str, data: bytes) -> None:
+        if self.archive is not None:
+            self.archive.writestr(filename, data)
+        else:
+            with open(os.path.join(self.out, filename), 'wb') as f:
+                f.write(data)
+
+    def close(self) -> None:
+        if self.archive is not None:
+            self.archive.close()
+
+def output_filename(index: int, name: str, extension: str) -> str:
+    # the given name without any directories, otherwise the position in the input
+    if name:
+        name = os.path.basename(str(name).replace('\\', '/'))
+    return f"{name or f'{index:06d}'}.{extension}"
+
+def unique_filename(filename: str, index: int, used: set) -> str:
+    # a name already written gets the position in the input appended (name_000042.png)
+    stem, extension = os.path.splitext(filename)
+    while filename in used:
+        filename = f"{stem}_{index:06d}{extension}"
+        stem = f"{stem}_{index:06d}"
+    used.add(filename)
+    return filename
+
+def ordered_results(pool: ProcessPoolExecutor, chunks, max_pending: int):
+    # the results of every chunk in input order, a window of max_pending chunks running ahead
+    pending = collections.deque(pool.submit(encode_chunk, chunk) for chunk in itertools.islice(chunks, max_pending))
+    while pending:
+        done = pending.popleft().result()
+        pending.extend(pool.submit(encode_chunk, chunk) for chunk in itertools.islice(chunks, 1))
+        yield from done
+
+def encode_batch(payloads, out: str, output: str = 'rgb', workers: int = None, chunk_size: int = 16,
+                 max_pending: int = None, **options) -> dict:
+    """
+    Encode every (line, name, text) payload, as read_payloads yields them, and write the files
+    to `out` (a directory or a .zip file), in input order. `options` are passed to encode_bytes
+    (mask_policy, ec_level, module_size, ...).
+    The payloads go to the workers `chunk_size` at a time, with at most max_pending chunks
+    (4 per worker by default) in flight: the input is streamed, and the workers are kept busy
+    while the oldest chunk is written.
+    Files that would get the same name (equal 'name's) are renamed, see unique_filename.
+    Returns {'encoded', 'failed', 'errors' [(line, name, error)], 'renamed' [(line, name, filename)],
+    'seconds', 'per_second'}.
+    """
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output!r}, expected one of {', '.join(OUTPUT_FORMATS)}")
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 4 * workers
+    options = dict(options, output=output)
+    extension = OUTPUT_FORMATS[output]
+
+    start = time.perf_counter()
+    encoded, errors, renamed, used = 0, [], [], set()
+    jobs = ((index, line, name, text, options) for index, (line, name, text) in enumerate(payloads))
+    chunks = iter(lambda: list(itertools.islice(jobs, chunk_size)), [])
+    writer = BatchWriter(out)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        results = ordered_results(pool, chunks, max_pending) if pool is not None else map(encode_job, jobs)
+
+        for index, line, name, data, error in results:
+            if error is not None:
+                errors.append((line, name, error))
+                continue
+            filename = output_filename(index, name, extension)
+            unique = unique_filename(filename, index, used)
+            if unique != filename:
+                renamed.append((line, name, unique))
+            writer.write(unique, data)
+            encoded += 1
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        writer.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        'encoded': encoded,
+        'failed': len(errors),
+        'errors': errors,
+        'renamed': renamed,
+        'seconds': seconds,
+        'per_second': encoded / seconds if seconds > 0 else 0.0,
+    }
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+def image_paths(sources: list[str]):
+    """
+    Yield the image files of every source: a directory (walked recursively),
+    a glob pattern (** included) or a single file.
+    """
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif glob.has_magic(source):
+            yield from (path for path in sorted(glob.glob(source, recursive=True)) if os.path.isfile(path))
+        else:
+            yield source
+
+def decode_job(path: str, cache_dir: str = None, cache_limit: int = 256 * 2**20) -> dict:
+    """
+    Runs in a worker process: one JSONL record for an image.
+    The payload of several symbols (e.g. a Structured Append sequence) is reassembled;
+    version, EC level and mask are those of the first symbol, 'corrected' is the number of
+    codewords Reed-Solomon fixed in all of them.
+    With a cache directory, results are looked up by image content first ('cache' is the tier
+    they came from, or 'miss').
+    """
+    start = time.perf_counter()
+    record = {'path': path, 'payload': None, 'version': None, 'ec_level': None, 'mask': None,
+              'corrected': None, 'symbols': 0, 'error': None, 'cache': None}
+    cache = open_cache(cache_dir, disk_limit=cache_limit) if cache_dir else None
+    try:
+        symbols, record['cache'] = image_symbols(path, cache)
+    except OSError:
+        symbols = []
+        record['error'] = "Could not read the image"
+    except Exception as e:
+        # one image the decoder fails on doesn't stop the rest of the batch
+        symbols = []
+        record['error'] = str(e) if isinstance(e, ValueError) else f"{type(e).__name__}: {e}"
+
+    decoded = [symbol for symbol in symbols if symbol['error'] is None]
+    if decoded:
+        first = decoded[0]
+        text = assemble_structured_append(decoded)
+        record.update(version=first['version'], ec_level=first['ec_level'], mask=first['mask'],
+                      corrected=sum(symbol['corrected'] for symbol in decoded), symbols=len(decoded))
+        # an incomplete Structured Append sequence
+        partial = any(symbol['structured_append'] for symbol in decoded) and text.startswith("Structured append:")
+        record['error' if partial else 'payload'] = text
+    elif record['error'] is None:
+        record['error'] = symbols[0]['error'] if symbols else "No QR code found."
+
+    record['latency_ms'] = round((time.perf_counter() - start) * 1000, 3)
+    return record
+
+def decode_batch(paths, workers: int = None, max_pending: int = None, cache_dir: str = None,
+                 cache_limit: int = 256 * 2**20):
+    """
+    Decode every image and yield its record (see decode_job) as soon as it is ready,
+    so a slow image doesn't hold back the others: the records come in completion order.
+    At most max_pending images (4 per worker by default) are queued at a time.
+    Every worker process keeps its own memory tier over the shared cache directory.
+    """
+    workers = workers or os.cpu_count() or 1
+    job = functools.partial(decode_job, cache_dir=cache_dir, cache_limit=cache_limit)
+    if workers == 1:
+        yield from map(job, paths)
+        return
+
+    max_pending = max_pending or 4 * workers
+    paths = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(job, path) for path in itertools.islice(paths, max_pending)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+            pending |= {pool.submit(job, path) for path in itertools.islice(paths, len(done))}
@@ -0,0 +1,59 @@
+import numpy as np
+
+# Append-only sequence of bits, stored packed 8 bits per byte.
+# Whole bytes go to a bytearray, the (at most 7) trailing bits wait in an int.
+class BitBuffer:
+    def __init__(self) -> None:
+        self._bytes = bytearray()
+        self._tail = 0
+        self._tail_len = 0
+
+    def __len__(self) -> int:
+        return 8 * len(self._bytes) + self._tail_len
+
+    def append_bits(self, value: int, length: int) -> None:
+        if length < 0 or value < 0 or value >> length:
+            raise ValueError(f"value {value} does not fit in {length} bits")
+
+        acc = (self._tail << length) | value
+        acc_len = self._tail_len + length
+        if acc_len >= 8:
+            rest = acc_len % 8
+            self._bytes += (acc >> rest).to_bytes(acc_len // 8, 'big')
+            acc &= (1 << rest) - 1
+            acc_len = rest
+        self._tail, self._tail_len = acc, acc_len
+
+    def append_bytes(self, data: bytes) -> None:
+        if self._tail_len == 0:
+            self._bytes += data
+        else:
+            self.append_bits(int.from_bytes(data, 'big'), 8 * len(data))
+
+    def extend(self, other: 'BitBuffer') -> None:
+        self.append_bytes(bytes(other._bytes))
+        self.append_bits(other._tail, other._tail_len)
+
+    def pad_to_byte(self) -> None:
+        if self._tail_len:
+            self.append_bits(0, 8 - self._tail_len)
+
+    def pad(self, total_bits: int, pattern: bytes = b'\x00') -> None:
+        # zero-fill up to the next byte, then repeat the pad bytes until total_bits is reached
+        self.pad_to_byte()
+        i = 0
+        while len(self) + 8 <= total_bits:
+            self.append_bytes(pattern[i:i + 1])
+            i = (i + 1) % len(pattern)
+        if len(self) < total_bits:
+            self.append_bits(0, total_bits - len(self))
+
+    def to_bytes(self) -> bytes:
+        # a partial last byte is left-aligned and zero-filled
+        if self._tail_len == 0:
+            return bytes(self._bytes)
+        return bytes(self._bytes) + bytes([self._tail << (8 - self._tail_len)])
+
+    def to_bit_array(self) -> np.ndarray:
+        bits = np.unpackbits(np.frombuffer(self.to_bytes(), dtype=np.uint8))
+        return bits[:len(self)]
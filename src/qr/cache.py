@@ -0,0 +1,181 @@
+import functools
+import hashlib
+import json
+import os
+from collections import OrderedDict
+import numpy as np
+from qr.decoder import detect_qr_codes, DETECTION_MAX_SIDE, DETECTION_MIN_MODULE
+
+# Decode results cached by the content of the image: an LRU memory tier and an optional disk tier
+
+# bump when the cached results change shape or the decoder reads images differently
+CACHE_FORMAT = 1
+
+def decoder_params() -> dict:
+    # everything besides the image that changes the decode result
+    return {'format': CACHE_FORMAT, 'detection_max_side': DETECTION_MAX_SIDE,
+            'detection_min_module': DETECTION_MIN_MODULE}
+
+def image_key(data: bytes | np.ndarray, params: dict = None) -> str:
+    """
+    SHA-256 of the image (encoded bytes, or an array with its shape and type) and the decoder parameters.
+    """
+    digest = hashlib.sha256()
+    if isinstance(data, np.ndarray):
+        digest.update(f'{data.shape}{data.dtype}'.encode())
+        data = np.ascontiguousarray(data).tobytes()
+    digest.update(bytes(data))
+    digest.update(json.dumps(params if params is not None else decoder_params(), sort_keys=True).encode())
+    return digest.hexdigest()
+
+class DecodeCache:
+    """
+    JSON-serializable decode results by key. The memory tier keeps the `memory_size` most recently
+    used entries; the disk tier (one file per entry under `directory`, none if None) is kept under
+    `disk_limit` bytes by deleting the least recently used files.
+    Counts hits per tier and misses.
+    """
+    def __init__(self, directory: str = None, memory_size: int = 1024, disk_limit: int = 256 * 2**20) -> None:
+        self.memory_size = memory_size
+        self.memory = OrderedDict()
+        self.directory = directory
+        self.disk_limit = disk_limit
+        self.disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.disk_bytes = sum(size for _, _, size in self.disk_entries())
+
+    def disk_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def disk_entries(self) -> list[tuple]:
+        # (last use, path, size) of every file on disk
+        entries = []
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith('.json'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:  # evicted by another process
+                        continue
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def remember(self, key: str, value) -> None:
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get(self, key: str):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.memory_hits += 1
+            return self.memory[key]
+
+        if self.directory is not None:
+            path = self.disk_path(key)
+            try:
+                with open(path, encoding='utf-8') as f:
+                    value = json.load(f)
+                os.utime(path)  # last use, for the eviction
+            except (FileNotFoundError, json.JSONDecodeError):
+                pass
+            else:
+                self.disk_hits += 1
+                self.remember(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value) -> None:
+        self.remember(key, value)
+        if self.directory is None:
+            return
+
+        path = self.disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        # write to a temporary file and rename, so readers never see a partial entry
+        temp = f'{path}.{os.getpid()}.tmp'
+        with open(temp, 'wb') as f:
+            f.write(data)
+        os.replace(temp, path)
+        self.disk_bytes += len(data)
+        if self.disk_bytes > self.disk_limit:
+            self.evict()
+
+    def evict(self) -> None:
+        # delete the least recently used files until the disk tier is back under 90% of its limit
+        entries = sorted(self.disk_entries())
+        self.disk_bytes = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self.disk_bytes <= 0.9 * self.disk_limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.disk_bytes -= size
+            self.memory.pop(os.path.basename(path)[:-len('.json')], None)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.directory is not None:
+            for _, path, _ in self.disk_entries():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self.disk_bytes = 0
+
+    @property
+    def stats(self) -> dict:
+        return {'memory_hits': self.memory_hits, 'disk_hits': self.disk_hits,
+                'hits': self.memory_hits + self.disk_hits, 'misses': self.misses,
+                'memory_entries': len(self.memory), 'disk_bytes': self.disk_bytes}
+
+@functools.lru_cache(maxsize=None)
+def open_cache(directory: str = None, memory_size: int = 1024, disk_limit: int = 256 * 2**20) -> DecodeCache:
+    # one cache per process and directory (e.g. in the workers of a process pool)
+    return DecodeCache(directory, memory_size, disk_limit)
+
+def image_symbols(source, cache: DecodeCache = None) -> tuple[list[dict], str]:
+    """
+    Decode every QR code of an image (path, encoded bytes or array), through the cache if one is given.
+    Returns (symbols, tier): the symbols of detect_qr_codes without the image data ('roi', 'quad', 'symbol'),
+    and where they came from: 'memory', 'disk', 'miss' (decoded and stored) or None without a cache.
+    An image that can't be read raises ValueError and isn't cached.
+    """
+    if cache is None:
+        return summarize(detect_qr_codes(source)[0]), None
+
+    if not isinstance(source, (bytes, bytearray, memoryview, np.ndarray)):
+        with open(source, 'rb') as f:
+            source = f.read()
+    if (source.size if isinstance(source, np.ndarray) else len(source)) == 0:
+        # rejected before the lookup, so it isn't counted as a miss
+        raise ValueError("Could not read the image")
+    key = image_key(source)
+    memory_hits = cache.memory_hits
+    symbols = cache.get(key)
+    if symbols is not None:
+        return symbols, 'memory' if cache.memory_hits > memory_hits else 'disk'
+
+    symbols = summarize(detect_qr_codes(source)[0])
+    cache.put(key, symbols)
+    return symbols, 'miss'
+
+def summarize(symbols: list[dict]) -> list[dict]:
+    # the JSON-serializable part of every symbol
+    return [{key: [int(v) for v in value] if key == 'box' else value
+             for key, value in symbol.items() if key not in ('roi', 'quad', 'symbol')}
+            for symbol in symbols]
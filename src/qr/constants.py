@@ -3,30 +3,97 @@ import os
 # Project root (for file paths)
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# RS parameters for error correction level L, versions 1-3
-RS_PARAMS = {
-    1: (26, 7),
-    2: (44, 10),
-    3: (70, 15)
+# Error correction levels and their 2-bit indicator in the format information
+EC_LEVELS = ('L', 'M', 'Q', 'H')
+EC_LEVEL_BITS = {'L': 0b01, 'M': 0b00, 'Q': 0b11, 'H': 0b10}
+
+# Number of ECC codewords per block, by error correction level and version (index 0 unused)
+ECC_CODEWORDS_PER_BLOCK = {
+    #     0,  1,  2,  3,  4,  5,  6,  7,  8,  9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40
+    'L': [-1,  7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28, 28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30],
+    'M': [-1, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26, 26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28],
+    'Q': [-1, 13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30, 28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30],
+    'H': [-1, 17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28, 30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30],
+}
+
+# Number of error correction blocks, by error correction level and version (index 0 unused)
+NUM_ERROR_CORRECTION_BLOCKS = {
+    #     0, 1, 2, 3, 4, 5, 6, 7, 8, 9,10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40
+    'L': [-1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 4,  4,  4,  4,  4,  6,  6,  6,  6,  7,  8,  8,  9,  9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25],
+    'M': [-1, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5,  5,  8,  9,  9, 10, 10, 11, 13, 14, 16, 17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49],
+    'Q': [-1, 1, 1, 2, 2, 4, 4, 6, 6, 8, 8,  8, 10, 12, 16, 12, 17, 16, 18, 21, 20, 23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68],
+    'H': [-1, 1, 1, 2, 4, 4, 4, 5, 6, 8, 8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25, 25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81],
+}
+
+# Mode indicators of the supported segment modes
+MODE_INDICATORS = {
+    'numeric': 0b0001,
+    'alphanumeric': 0b0010,
+    'byte': 0b0100,
 }
 
-# Alignment pattern centers for versions 2 to 3
+# Structured Append header: indicator, 4 bit symbol index, 4 bit symbol count - 1, 8 bit parity
+STRUCTURED_APPEND_INDICATOR = 0b0011
+STRUCTURED_APPEND_BITS = 20
+MAX_STRUCTURED_APPEND_SYMBOLS = 16
+
+# Each alphanumeric character is indexed in this table (0-44)
+ALPHANUMERIC_CHARSET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+
+# Character count field width for versions 1-9, 10-26 and 27-40, by mode
+CHAR_COUNT_BITS = {
+    'numeric': (10, 12, 14),
+    'alphanumeric': (9, 11, 13),
+    'byte': (8, 16, 16),
+}
+
+# Alignment pattern centers for versions 2 to 40
 ALIGNMENT_CENTERS = {
     2: [6, 18],
-    3: [6, 22]
+    3: [6, 22],
+    4: [6, 26],
+    5: [6, 30],
+    6: [6, 34],
+    7: [6, 22, 38],
+    8: [6, 24, 42],
+    9: [6, 26, 46],
+    10: [6, 28, 50],
+    11: [6, 30, 54],
+    12: [6, 32, 58],
+    13: [6, 34, 62],
+    14: [6, 26, 46, 66],
+    15: [6, 26, 48, 70],
+    16: [6, 26, 50, 74],
+    17: [6, 30, 54, 78],
+    18: [6, 30, 56, 82],
+    19: [6, 30, 58, 86],
+    20: [6, 34, 62, 90],
+    21: [6, 28, 50, 72, 94],
+    22: [6, 26, 50, 74, 98],
+    23: [6, 30, 54, 78, 102],
+    24: [6, 28, 54, 80, 106],
+    25: [6, 32, 58, 84, 110],
+    26: [6, 30, 58, 86, 114],
+    27: [6, 34, 62, 90, 118],
+    28: [6, 26, 50, 74, 98, 122],
+    29: [6, 30, 54, 78, 102, 126],
+    30: [6, 26, 52, 78, 104, 130],
+    31: [6, 30, 56, 82, 108, 134],
+    32: [6, 34, 60, 86, 112, 138],
+    33: [6, 30, 58, 86, 114, 142],
+    34: [6, 34, 62, 90, 118, 146],
+    35: [6, 30, 54, 78, 102, 126, 150],
+    36: [6, 24, 50, 76, 102, 128, 154],
+    37: [6, 28, 54, 80, 106, 132, 158],
+    38: [6, 32, 58, 84, 110, 136, 162],
+    39: [6, 26, 54, 82, 110, 138, 166],
+    40: [6, 30, 58, 86, 114, 142, 170],
 }
 
-# Format string for error correction
-FORMAT_STRING = {
-    0: '101010000010010',
-    1: '101000100100101',
-    2: '101111001111100',
-    3: '101101101001011',
-    4: '100010111111001',
-    5: '100000011001110',
-    6: '100111110010111',
-    7: '100101010100000'
-}
+# Generator polynomials of the BCH codes protecting format and version information
+FORMAT_GENERATOR = 0x537
+FORMAT_XOR_MASK = 0x5412
+VERSION_GENERATOR = 0x1f25
 
 # Colors
 WHITE = (255, 255, 255)
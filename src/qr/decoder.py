@@ -1,34 +1,100 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from PIL import Image
 import cv2
-from reedsolo import RSCodec, ReedSolomonError
 import qr.constants as constants
+import qr.layout as layout
+import qr.poly as poly
+from qr.symbol import QRSymbol
+
+# longest side of the pyramid level the QR code candidates are searched on first
+DETECTION_MAX_SIDE = 640
+# smallest module (full resolution pixels) the detection retries finer levels for:
+# it stays at least 2 pixels wide on the finest level searched
+DETECTION_MIN_MODULE = 4
+
+def load_image(source) -> np.ndarray:
+    """
+    The image as a BGR array, from a file path, encoded image bytes (PNG, JPEG, ...)
+    or an array (grayscale, BGR or BGRA, of any numeric type), without any temporary file.
+    Raises ValueError if the image can't be read.
+    """
+    if isinstance(source, np.ndarray):
+        if source.ndim == 3 and source.shape[2] == 1:
+            source = source[:, :, 0]
+        if source.size == 0 or not (source.ndim == 2 or (source.ndim == 3 and source.shape[2] in (3, 4))):
+            raise ValueError("Could not read the image")
+        if source.dtype != np.uint8:
+            # values outside 0-255 saturate instead of wrapping around
+            source = np.clip(source, 0, 255).astype(np.uint8)
+        if source.ndim == 2:
+            return cv2.cvtColor(source, cv2.COLOR_GRAY2BGR)
+        if source.shape[2] == 4:
+            return cv2.cvtColor(source, cv2.COLOR_BGRA2BGR)
+        return source.copy()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        # cv2.imdecode fails on an empty buffer instead of returning None
+        image = cv2.imdecode(np.frombuffer(source, dtype=np.uint8), cv2.IMREAD_COLOR) if len(source) else None
+    else:
+        image = cv2.imread(str(source))
+    if image is None:
+        raise ValueError("Could not read the image")
+    return image
 
 # https://stackoverflow.com/questions/60359398/python-detect-a-qr-code-from-an-image-and-crop-using-opencv
-def find_qr_in_image(image_path: str, draw_rectangle: bool = False) -> tuple:
+def pyramid_level(gray: np.array, max_side: int = DETECTION_MAX_SIDE) -> tuple:
     """
-    Detects and extracts the QR code from an image.
-    Args:
-        image_path (str): The file path to the input image.
-    Returns:
-        np.array: The extracted QR code region of interest (ROI) as an image array.
-    This function performs the following steps:
-    1. Loads the image from the specified path.
-    2. Converts the image to grayscale.
-    3. Applies Gaussian blur to reduce noise.
-    4. Uses Otsu's thresholding to convert the image to a binary image.
-    5. Applies morphological closing to close small gaps in the binary image.
-    6. Finds contours in the binary image.
-    7. Filters contours to identify potential QR code regions based on contour properties.
+    Halve the image (cv2.pyrDown) until its longest side is at most max_side.
+    Returns (level image, scale from the level back to the full resolution).
     """
-    image = cv2.imread(image_path)
+    scale = 1
+    while max(gray.shape[:2]) > max_side:
+        gray = cv2.pyrDown(gray)
+        scale *= 2
+    return gray, scale
 
-    # Convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+def detection_levels(gray: np.array) -> list[tuple]:
+    """
+    (max_side, scale) of the pyramid levels to search, coarsest first: the DETECTION_MAX_SIDE
+    level, then every finer one down to a scale of DETECTION_MIN_MODULE / 2.
+    """
+    longest = max(gray.shape[:2])
+    scale = 1
+    while -(-longest // scale) > DETECTION_MAX_SIDE:
+        scale *= 2
+
+    levels = [(-(-longest // scale), scale)]
+    while scale > 1 and scale // 2 >= DETECTION_MIN_MODULE // 2:
+        scale //= 2
+        levels.append((-(-longest // scale), scale))
+    return levels
+
+def odd_kernel(size: float) -> int:
+    return max(3, int(round(size)) | 1)
+
+def qr_candidates(gray: np.array, max_side: int = DETECTION_MAX_SIDE) -> list[tuple]:
+    """
+    Find the regions of a grayscale image that may hold a QR code.
+    Returns a list of (bounding box (x, y, w, h), quad (4 corner points)) in full resolution pixels.
+    This function performs the following steps:
+    0. Detects on a downscaled pyramid level (longest side at most max_side); the kernel
+       sizes and the area threshold, given for full resolution, shrink with the level.
+    1. Applies Gaussian blur to reduce noise.
+    2. Uses Otsu's thresholding to convert the image to a binary image.
+    3. Applies morphological closing to close small gaps in the binary image.
+    4. Finds contours in the binary image.
+    5. Filters contours to identify potential QR code regions based on contour properties.
+    """
+    full_shape = gray.shape[:2]
+    gray, scale = pyramid_level(gray, max_side)
+    blur_size = odd_kernel(9 / scale)
+    close_size = odd_kernel(9 / scale)
+    min_area = 1000 / scale ** 2
 
     # Apply Gaussian blur
     # This helps remove high-frequency noise and retains the low-frequency components.
-    blur = cv2.GaussianBlur(gray, (9,9), 0)
+    blur = cv2.GaussianBlur(gray, (blur_size, blur_size), 0)
 
     # Apply Otsu's threshold
     # https://en.wikipedia.org/wiki/Otsu%27s_method
@@ -43,7 +109,7 @@ def find_qr_in_image(image_path: str, draw_rectangle: bool = False) -> tuple:
     # I regret getting into this
     # Applies morphological closing (cv2.MORPH_CLOSE), which fills small holes and connects nearby white regions.
     # This step helps in making QR codes more solid and connected for better contour detection.
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9)) # modify kernel in order to get better morphological closing
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (close_size, close_size)) # modify kernel in order to get better morphological closing
     close = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, iterations=2)
 
     # Find contours and filter for QR code
@@ -68,22 +134,101 @@ def find_qr_in_image(image_path: str, draw_rectangle: bool = False) -> tuple:
             ar = w / float(h)
 
             # possible qr codes
-            if area <= 1000 or (ar < 0.7 or ar > 1.4):
+            if area <= min_area or (ar < 0.7 or ar > 1.4):
                 continue
 
-            candidates.append((x, y, w, h))
+            # back to full resolution, one level pixel wider on every side to cover the rounding;
+            # the rotated rectangle may reach past the image edges
+            x0, y0 = max((x - 1) * scale, 0), max((y - 1) * scale, 0)
+            x1, y1 = min((x + w + 1) * scale, full_shape[1]), min((y + h + 1) * scale, full_shape[0])
+            candidates.append(((x0, y0, x1 - x0, y1 - y0), approx * scale))
 
-    for (x, y, w, h) in candidates:
-        candidate_roi = gray[y:y+h, x:x+w]
+    return candidates
 
-        if detect_version(candidate_roi) is not None:
-            if draw_rectangle:
-                cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 3)
-            return candidate_roi, image
+def locate_qr_codes(gray: np.array, find_all: bool = True, fallback: bool = True):
+    """
+    Yield (bounding box, quad, QRSymbol) for every candidate region that holds a QR code.
+    With find_all the candidates are tried largest first, skipping the regions nested
+    inside one already found.
+    With fallback, when no candidate holds a QR code, the finder patterns are searched
+    in the whole image (codes with very large modules).
+    The search starts on the coarsest pyramid level (see detection_levels) and moves to the
+    finer ones only while nothing is found, so small modules in large frames aren't lost.
+    """
+    for max_side, scale in detection_levels(gray):
+        candidates = qr_candidates(gray, max_side)
+        # largest first, so a QR code is found before the contours nested inside it
+        if find_all:
+            candidates.sort(key=lambda candidate: candidate[0][2] * candidate[0][3], reverse=True)
+        found = []
+
+        for (x, y, w, h), quad in candidates:
+            if any(fx <= x and fy <= y and x + w <= fx + fw and y + h <= fy + fh for fx, fy, fw, fh in found):
+                continue
+            # the finder patterns are searched at the resolution of this level (or finer)
+            symbol = read_grid(gray[y:y+h, x:x+w], max(DETECTION_MAX_SIDE, -(-max(w, h) // scale)))
+            if symbol is not None:
+                found.append((x, y, w, h))
+                yield (x, y, w, h), quad, symbol
+        if found:
+            return
+
+        if fallback:
+            # very large modules don't merge into one region: look for the finder patterns in the whole image
+            grid, version = sample_qr_grid(gray, max_side)
+            if grid is not None:
+                h, w = gray.shape[:2]
+                yield (0, 0, w, h), np.array([[0, 0], [w, 0], [w, h], [0, h]]), QRSymbol.from_grid(grid)
+                return
+
+def find_qr_in_image(image_path, draw_rectangle: bool = False, find_all: bool = False) -> tuple:
+    """
+    Detects and extracts the QR code from an image.
+    Args:
+        image_path: The file path to the input image, its encoded bytes or an image array.
+        find_all (bool): Return every QR code in the image (e.g. the symbols of a
+            Structured Append sequence) instead of the first one.
+    Returns:
+        np.array: The extracted QR code region of interest (ROI) as an image array,
+            or a list of them, largest first, with find_all.
+    """
+    image = load_image(image_path)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
+    rois = []
+    for (x, y, w, h), _, _ in locate_qr_codes(gray, find_all):
+        if draw_rectangle:
+            cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 3)
+        if not find_all:
+            return gray[y:y+h, x:x+w], image
+        rois.append(gray[y:y+h, x:x+w])
+
+    if find_all:
+        # nothing is printed: the caller reports an empty list (e.g. full_decode)
+        return rois, image
     print("No QR code found.")
     return None, image
 
+def detect_qr_codes(source, draw_rectangle: bool = False) -> tuple[list[dict], np.ndarray]:
+    """
+    Find and decode every QR code in an image (path, encoded bytes or array) in one pass.
+    Returns (symbols, image); every symbol is a dict with
+    'roi', 'box' (x, y, w, h), 'quad' (4 corner points), 'symbol' (the QRSymbol read), 'version',
+    the decode_symbol keys ('text', 'structured_append', ...) and 'error' (None when decoding succeeded).
+    """
+    image = load_image(source)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    symbols = []
+    for (x, y, w, h), quad, qr_symbol in locate_qr_codes(gray):
+        if draw_rectangle:
+            cv2.polylines(image, [quad.reshape(-1, 1, 2).astype(np.int32)], True, (0, 255, 0), 3)
+        roi = gray[y:y+h, x:x+w]
+        symbol = decode_symbol(qr_symbol)
+        symbol.update(roi=roi, box=(x, y, w, h), quad=quad, symbol=qr_symbol, version=qr_symbol.version)
+        symbols.append(symbol)
+    return symbols, image
+
 
 # Generalised resizing
 def rescale_to_grid(image: np.array, grid_size: int) -> np.array:
@@ -96,19 +241,34 @@ def rescale_to_grid(image: np.array, grid_size: int) -> np.array:
 
 def detect_version(image: np.array) -> int:
     """
-    Try candidate versions (1–3) by rescaling and checking for three finder patterns.
+    Try candidate versions (1–40) by rescaling and checking for three finder patterns.
     Returns the first matching version or None if not detected.
     """
     if image is None:
         return None
-    for version in range(1, 4):
-        grid_size = 21 + 4 * (version - 1)
+    for version in range(1, 41):
+        grid_size = layout.symbol_size(version)
+        # every module needs at least one pixel
+        if grid_size > min(image.shape[:2]):
+            break
         grid = rescale_to_grid(image, grid_size)
 
         if is_qr_code(grid):
             return version
     return None
 
+# 7x7 finder pattern: False = black, True = white
+FINDER_PATTERN = np.array([
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 1, 1, 1, 1, 1, 0],
+    [0, 1, 0, 0, 0, 1, 0],
+    [0, 1, 0, 0, 0, 1, 0],
+    [0, 1, 0, 0, 0, 1, 0],
+    [0, 1, 1, 1, 1, 1, 0],
+    [0, 0, 0, 0, 0, 0, 0]
+], dtype=bool)
+FINDER_PATTERN.setflags(write=False)
+
 def is_finder_pattern(block: np.array) -> bool:
     """
     Check if a 7x7 block matches the finder pattern.
@@ -117,37 +277,196 @@ def is_finder_pattern(block: np.array) -> bool:
     """
     if block.shape != (7, 7):
         return False
-    expected = np.array([
-        [0, 0, 0, 0, 0, 0, 0],
-        [0, 1, 1, 1, 1, 1, 0],
-        [0, 1, 0, 0, 0, 1, 0],
-        [0, 1, 0, 0, 0, 1, 0],
-        [0, 1, 0, 0, 0, 1, 0],
-        [0, 1, 1, 1, 1, 1, 0],
-        [0, 0, 0, 0, 0, 0, 0]
-    ], dtype=bool)
-    return np.array_equal(block, expected)
-
-def detect_finder_patterns(matrix: np.array) -> np.array:
-    """
-    Slide a 7x7 window over the matrix to locate finder patterns.
-    Returns a list with the center positions (row, col) of the found finder patterns.
-    """
-    positions = np.array([], dtype=int).reshape(0, 2)
+    return np.array_equal(block, FINDER_PATTERN)
+
+def is_qr_code(matrix: np.array) -> bool:
+    """
+    Verify if the 3 finder patterns are located in their corners.
+    """
     n = matrix.shape[0]
-    for i in range(n - 6):
-        for j in range(n - 6):
-            block = matrix[i:i+7, j:j+7]
-            if is_finder_pattern(block):
-                positions = np.vstack([positions, [i+3, j+3]])
+    if n < 7:
+        return False
+    corners = np.stack([matrix[:7, :7], matrix[:7, n-7:], matrix[n-7:, :7]])
+    return bool((corners == FINDER_PATTERN).all())
 
-    return positions
+# Perspective-correct sampling
+def locate_finder_patterns(image: np.array, max_side: int = DETECTION_MAX_SIDE) -> list[dict]:
+    """
+    Find the finder patterns of a grayscale image: dark contours holding a light hole
+    holding a dark center, with the 7x7 : 3x3 area ratio of a finder.
+    The contours are searched on the pyramid level (longest side at most max_side):
+    their number, and the cost of the search, explodes on large noisy images.
+    Returns {'center', 'corners' (4 points), 'area'} for each in full resolution pixels, largest first.
+    """
+    image, scale = pyramid_level(image, max_side)
+    dark = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    contours, hierarchy = cv2.findContours(dark, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None:
+        return []
+    hierarchy = hierarchy[0]
+
+    finders = []
+    for i, contour in enumerate(contours):
+        hole = hierarchy[i][2]
+        if hole < 0 or hierarchy[hole][2] < 0:
+            continue
+        center = hierarchy[hole][2]
+        area = cv2.contourArea(contour)
+        if area < 49 or not 0.08 < cv2.contourArea(contours[center]) / area < 0.35:
+            continue
+
+        corners = cv2.approxPolyDP(contour, 0.05 * cv2.arcLength(contour, True), True).reshape(-1, 2)
+        if len(corners) != 4:
+            corners = cv2.boxPoints(cv2.minAreaRect(contour))
+        moments = cv2.moments(contour)
+        center = np.array([moments['m10'], moments['m01']]) / moments['m00']
+        # back to full resolution: a level pixel covers scale x scale pixels, and the
+        # contour runs through the edge pixels (the side is one pixel short)
+        finders.append({'center': center * scale + (scale - 1) / 2,
+                        'corners': (corners * scale + (scale - 1) / 2).astype(np.float32),
+                        'area': ((np.sqrt(area) + 1) * scale - 1) ** 2})
+
+    finders.sort(key=lambda finder: finder['area'], reverse=True)
+    return finders
+
+def order_finder_patterns(finders: list[dict]) -> tuple:
+    """
+    (top-left, top-right, bottom-left): the top-left finder is opposite the longest side,
+    the top-right one follows it clockwise.
+    """
+    a, b, c = finders
+    dist = lambda p, q: np.linalg.norm(p['center'] - q['center'])
+    top_left, q, r = max(((a, b, c), (b, a, c), (c, a, b)), key=lambda t: dist(t[1], t[2]))
+    u, v = q['center'] - top_left['center'], r['center'] - top_left['center']
+    if u[0] * v[1] - u[1] * v[0] < 0:
+        q, r = r, q
+    return top_left, q, r
+
+def finder_homography(finders: tuple, size: int) -> np.ndarray:
+    """
+    Homography from module coordinates (x = column, y = row, module edges at integers)
+    to image pixels, fitted to the 12 outer corners of the three finder patterns.
+    The corners are matched up through the affine map of the finder centers.
+    """
+    targets = [np.array([[0, 0], [7, 0], [7, 7], [0, 7]], dtype=np.float32) + offset
+               for offset in ((0, 0), (size - 7, 0), (0, size - 7))]
+    centers = np.array([finder['center'] for finder in finders], dtype=np.float32)
+    module_centers = np.array([[3.5, 3.5], [size - 3.5, 3.5], [3.5, size - 3.5]], dtype=np.float32)
+    to_modules = cv2.getAffineTransform(centers, module_centers)
+
+    src, dst = [], []
+    for finder, target in zip(finders, targets):
+        mapped = cv2.transform(finder['corners'][None], to_modules)[0]
+        nearest = np.argmin(np.linalg.norm(mapped[:, None] - target[None], axis=2), axis=1)
+        if len(set(nearest)) != 4:
+            # corners can't be matched, fall back to the affine map of the centers
+            return center_affine(finders, size)
+        src.extend(target[nearest])
+        dst.extend(finder['corners'])
+
+    homography = cv2.findHomography(np.array(src), np.array(dst))[0]
+    if homography is None:
+        return center_affine(finders, size)
+    return homography
+
+def center_affine(finders: tuple, size: int) -> np.ndarray:
+    # affine map (as a 3x3 matrix) from module coordinates to pixels through the three finder centers
+    centers = np.array([finder['center'] for finder in finders], dtype=np.float32)
+    module_centers = np.array([[3.5, 3.5], [size - 3.5, 3.5], [3.5, size - 3.5]], dtype=np.float32)
+    return np.vstack([cv2.getAffineTransform(module_centers, centers), [0, 0, 1]])
+
+def function_pattern_errors(matrix: np.array, version: int) -> int:
+    # misread modules of the function patterns (the format information aside)
+    template = layout.function_template(version)
+    fixed = template <= 1
+    return int((matrix[fixed] != (template[fixed] == 1)).sum())
+
+def sample_modules(image: np.array, homography: np.ndarray, size: int) -> np.array:
+    """
+    Sample the module centers through the homography: the mean of a 3x3 neighborhood
+    a quarter module apart, thresholded against the local min/max of the surrounding
+    7x7 modules (the global Otsu threshold where there is no local contrast).
+    Returns the grid, True = white.
+    """
+    rows, cols = np.indices((size, size))
+    points = np.stack([cols + 0.5, rows + 0.5], axis=-1).reshape(-1, 1, 2).astype(np.float32)
+    centers = cv2.perspectiveTransform(points, homography).reshape(size, size, 2)
+
+    # a quarter of the module pitch; small modules are only sampled at their center
+    pitch = np.linalg.norm(centers[:, 1:] - centers[:, :-1], axis=-1).mean()
+    step = int(pitch / 4)
+    h, w = image.shape[:2]
+    means = np.zeros((size, size), dtype=np.float32)
+    for dy in (-step, 0, step):
+        for dx in (-step, 0, step):
+            x = np.clip(np.rint(centers[..., 0] + dx).astype(int), 0, w - 1)
+            y = np.clip(np.rint(centers[..., 1] + dy).astype(int), 0, h - 1)
+            means += image[y, x]
+    means /= 9
+
+    global_threshold = cv2.threshold(means.astype(np.uint8), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[0]
+    kernel = np.ones((7, 7), dtype=np.uint8)
+    local_max = cv2.dilate(means, kernel)
+    local_min = cv2.erode(means, kernel)
+    contrast = means.max() - means.min()
+    threshold = np.where(local_max - local_min > contrast / 2, (local_max + local_min) / 2, global_threshold)
+    return means > threshold
+
+def sample_qr_grid(image: np.array, max_side: int = DETECTION_MAX_SIDE) -> tuple:
+    """
+    Read the module grid of a cropped QR code, which may be rotated or skewed:
+    locate the three finder patterns (on a pyramid level of at most max_side), estimate
+    the version from their spacing, fit a homography to their corners and sample the module centers.
+    Returns (grid, version), or (None, None) when no QR code is found.
+    """
+    if image is None or min(image.shape[:2]) < 21:
+        return None, None
+    finders = locate_finder_patterns(image, max_side)
+    if len(finders) < 3:
+        return None, None
+    finders = order_finder_patterns(finders[:3])
+
+    # finders are 7 modules wide (the contour runs through the edge pixels, one short)
+    # and their centers are (size - 7) modules apart
+    module = np.mean([np.sqrt(finder['area']) + 1 for finder in finders]) / 7
+    spacing = np.mean([np.linalg.norm(finders[0]['center'] - finder['center']) for finder in finders[1:]])
+    estimate = (spacing / module + 7 - 17) / 4
+
+    # the closest versions first; the finders fit any grid size, the timing patterns don't
+    for version in sorted(range(1, 41), key=lambda v: abs(v - estimate))[:3]:
+        size = layout.symbol_size(version)
+        # the homography corrects perspective, the affine map of the centers is steadier
+        # when the corners are noisy: keep the one that reads the function patterns best
+        grid = min((sample_modules(image, transform, size)
+                    for transform in (finder_homography(finders, size), center_affine(finders, size))),
+                   key=lambda grid: function_pattern_errors(grid, version))
+        if is_qr_code(grid) and has_timing_patterns(grid):
+            return grid, version
+    return None, None
+
+def has_timing_patterns(matrix: np.array, tolerance: float = 0.1) -> bool:
+    """
+    Check the timing patterns between the finders (black on even positions),
+    allowing a fraction of misread modules.
+    """
+    n = matrix.shape[0]
+    expected = np.arange(8, n - 8) % 2 == 1
+    errors = (matrix[6, 8:n-8] != expected).sum() + (matrix[8:n-8, 6] != expected).sum()
+    return errors <= tolerance * 2 * len(expected)
 
-def is_qr_code(matrix: np.array) -> bool:
+def read_grid(image: np.array, max_side: int = DETECTION_MAX_SIDE) -> QRSymbol:
     """
-    Verify if the 3 finder patterns are located.
+    The modules of a cropped QR code, as a QRSymbol (None if no QR code is found):
+    perspective-correct sampling first (finder patterns searched on a level of at most max_side),
+    resizing the whole image for every version as a fallback.
     """
-    return len(detect_finder_patterns(matrix)) >= 1
+    grid, version = sample_qr_grid(image, max_side)
+    if grid is not None:
+        return QRSymbol.from_grid(grid)
+    version = detect_version(image)
+    if version is None:
+        return None
+    return QRSymbol.from_grid(rescale_to_grid(image, layout.symbol_size(version)))
 
 # Fromat Segment
 def extract_format_info(matrix: np.array) -> dict:
@@ -168,205 +487,250 @@ def extract_format_info(matrix: np.array) -> dict:
     ec_level = {0b01: 'L', 0b00: 'M', 0b11: 'Q', 0b10: 'H'}.get(ec_level_bits, 'L') # default: L
     return {'mask_pattern': mask_pattern, 'ec_level': ec_level}
 
-def mask_condition(i: int, j: int, mask_pattern: int) -> bool:
-    # Return True if the mask condition is met for the given mask pattern
-    # taken from here https://commons.wikimedia.org/wiki/File:QR_Code_Mask_Patterns.svg
-    if mask_pattern in range(8):
-        return constants.MASK_CONDITIONS[mask_pattern](i, j)
-    return False
-
 def get_reserved_mask(version: int, size: int) -> np.array:
     """
-    Build a mask marking modules reserved for:
-      - Finder patterns (and their separators)
-      - Timing patterns (row 6 and column 6)
-      - Format information areas (near the top-left finder)
-      - Alignment patterns (for versions >= 2)
-    """
-    reserved = np.zeros((size, size), dtype=bool)
-    # Finder patterns
-    reserved[0:9, 0:9] = True           # top-left
-    reserved[0:9, size-8:size] = True   # top-right
-    reserved[size-8:size, 0:9] = True   # bottom-left
-
-    # Timing patterns
-    reserved[6, :] = True
-    reserved[:, 6] = True
-
-    # Format information areas (near top-left finder)
-    reserved[8, 0:8] = True
-    reserved[0:8, 8] = True
-
-    # Alignment patterns (for versions >= 2)
-    if version >= 2 and version in constants.ALIGNMENT_CENTERS:
-        centers = constants.ALIGNMENT_CENTERS[version]
-        for r in centers:
-            for c in centers:
-                # Skip if overlapping with finder patterns
-                if (r < 9 and c < 9) or (r < 9 and c >= size - 8) or (r >= size - 8 and c < 9):
-                    continue
-                r0 = max(r - 2, 0)
-                r1 = min(r + 3, size)
-                c0 = max(c - 2, 0)
-                c1 = min(c + 3, size)
-                reserved[r0:r1, c0:c1] = True
-
-    return reserved
-
-def unmask_qr(matrix: np.array, mask_pattern: int, reserved: np.array) -> np.array:
+    The mask marking the modules reserved for function patterns
+    (shared and read-only, cached per version).
+    """
+    return layout.reserved_mask(version)
+
+def unmask_qr(matrix: np.array, mask_pattern: int, version: int) -> np.array:
     """
     Remove the data mask from non-reserved modules.
     """
-    n = matrix.shape[0]
-    unmasked = matrix.copy()
-    for i in range(n):
-        for j in range(n):
-            if reserved[i, j]:
-                continue
-            if mask_condition(i, j, mask_pattern):
-                unmasked[i, j] = not unmasked[i, j]
-    return unmasked
+    if mask_pattern not in range(8):
+        return matrix.copy()
+    return matrix ^ layout.data_mask_patterns(version)[mask_pattern]
 
-def extract_data_bits(matrix: np.array, reserved: np.array) -> list:
+def extract_data_bits(matrix: np.array, version: int) -> np.ndarray:
     """
-    Traverse the module matrix in the zigzag order to extract data bits.
-    (This implementation iterates two columns at a time, skipping column 6.)
+    Read the data bits in zigzag order, using the placement index shared with the builder.
     """
-    n = matrix.shape[0]
-    bits = []
-    col = n - 1
-    upward = True
-    while col > 0:
-        if col == 6:  # Skip the timing pattern column
-            col -= 1
-        rows_range = range(n-1, -1, -1) if upward else range(n)
-        for r in rows_range:
-            for c in [col, col-1]:
-                if not reserved[r, c]:
-                    # black (False) → 1, white (True) → 0
-                    bit = 0 if matrix[r, c] else 1
-                    bits.append(bit)
-        upward = not upward
-        col -= 2
-    return bits
-
-def bits_to_bytes(bits: list) -> bytearray:
-    """
-    Group bits into 8-bit codewords.
-    """
-    # Ensure the number of bits is a multiple of 8 by padding with zeros
-    while len(bits) % 8 != 0:
-        bits.append(0)
-    b = bytearray()
-    for i in range(0, len(bits), 8):
-        byte = 0
-        for bit in bits[i:i+8]:
-            byte = (byte << 1) | bit
-        b.append(byte)
-    return b
-
-def decode_data(codewords: bytes) -> str:
-    """
-    Interpret the codewords.
+    rows, cols = layout.data_module_coords(version)
+    # black (False) → 1, white (True) → 0
+    return (~matrix[rows, cols].astype(bool)).astype(np.uint8)
+
+def bits_to_bytes(bits: np.ndarray) -> bytearray:
+    """
+    Group bits into 8-bit codewords (the last one is padded with zeros).
+    """
+    return bytearray(np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes())
+
+def decode_data(codewords: bytes, version: int = 1) -> str:
+    """
+    Interpret the codewords: a sequence of segments, up to the terminator (0000)
+    or the end of the data.
     Supported modes:
         - Byte
         - Alphanumeric
         - Numeric
+    Raises ValueError for a value the mode can't hold (e.g. an alphanumeric pair above 44 * 45 + 44).
     """
     bit_str = ''.join(f'{byte:08b}' for byte in codewords)
-    mode = bit_str[0:4]
-
-    # Byte mode
-    if mode == '0100':
-        count = int(bit_str[4:12], 2) # the number of bytes in the message
-        data_bits = bit_str[12:12 + count * 8]
-        data = bytearray()
-        for i in range(0, len(data_bits), 8):
-            data.append(int(data_bits[i:i+8], 2))
-        try:
-            return data.decode('utf-8')
-        except UnicodeDecodeError:
-            return data.decode('latin1')
-
-    # Alphanumeric mode
-    elif mode == '0010':
-        count = int(bit_str[4:13], 2) # char count
-        table = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:" # each alnum character is indexed in this table (0-44)
-        result = ""
-        bits_idx = 13
-        while len(result) < count and bits_idx + 11 <= len(bit_str):
-            num = int(bit_str[bits_idx:bits_idx+11], 2) # we read two characters simultaneously 45x45 = 2025 = aprox 2**11
-            result += table[num // 45] + table[num % 45]
-            bits_idx += 11
-        return result[:count]
-
-    # Numeric mode
-    elif mode == '0001':
-        count = int(bit_str[4:14], 2) # digit count
-        result = ""
-        bits_idx = 14
-        """
-        Each group of digits is encoded differently:
-        3 digits → 10 bits
-        2 digits → 7 bits
-        1 digit → 4 bits
-        """
-        while len(result) < count and bits_idx < len(bit_str):
-            remaining = count - len(result)
-            if remaining >= 3 and bits_idx + 10 <= len(bit_str):
-                num = int(bit_str[bits_idx:bits_idx+10], 2)
-                result += f"{num:03d}"
-                bits_idx += 10
-            elif remaining == 2 and bits_idx + 7 <= len(bit_str):
-                num = int(bit_str[bits_idx:bits_idx+7], 2)
-                result += f"{num:02d}"
-                bits_idx += 7
-            elif remaining == 1 and bits_idx + 4 <= len(bit_str):
-                num = int(bit_str[bits_idx:bits_idx+4], 2)
-                result += f"{num}"
-                bits_idx += 4
-            else:
-                break
-        return result
-    else:
-        return "Unsupported mode"
+    modes = {f'{indicator:04b}': mode for mode, indicator in constants.MODE_INDICATORS.items()}
+    result = ""
+    bits_idx = 0
+
+    while bits_idx + 4 <= len(bit_str):
+        if int(bit_str[bits_idx:bits_idx+4], 2) == constants.STRUCTURED_APPEND_INDICATOR:
+            # position in a Structured Append sequence, read by read_structured_append
+            bits_idx += constants.STRUCTURED_APPEND_BITS
+            continue
+        mode = modes.get(bit_str[bits_idx:bits_idx+4])
+        if mode is None:
+            # terminator, or a mode we can't read
+            if not result and bit_str[bits_idx:bits_idx+4] != '0000':
+                return "Unsupported mode"
+            break
+        count_end = bits_idx + 4 + layout.char_count_bits(mode, version)
+        if count_end > len(bit_str):
+            break
+        count = int(bit_str[bits_idx+4:count_end], 2) # the number of characters (bytes) in the segment
+        bits_idx = count_end
+
+        # Byte mode
+        if mode == 'byte':
+            data_bits = bit_str[bits_idx:bits_idx + count * 8]
+            data = bytearray()
+            for i in range(0, len(data_bits) - 7, 8):
+                data.append(int(data_bits[i:i+8], 2))
+            bits_idx += count * 8
+            try:
+                result += data.decode('utf-8')
+            except UnicodeDecodeError:
+                result += data.decode('latin1')
+
+        # Alphanumeric mode
+        elif mode == 'alphanumeric':
+            table = constants.ALPHANUMERIC_CHARSET # each alnum character is indexed in this table (0-44)
+            segment = ""
+            while len(segment) < count:
+                if count - len(segment) >= 2 and bits_idx + 11 <= len(bit_str):
+                    num = int(bit_str[bits_idx:bits_idx+11], 2) # we read two characters simultaneously 45x45 = 2025 = aprox 2**11
+                    if num >= 45 * 45:
+                        raise ValueError(f"Invalid alphanumeric value {num}")
+                    segment += table[num // 45] + table[num % 45]
+                    bits_idx += 11
+                elif count - len(segment) == 1 and bits_idx + 6 <= len(bit_str):
+                    # an odd last character takes 6 bits
+                    num = int(bit_str[bits_idx:bits_idx+6], 2)
+                    if num >= 45:
+                        raise ValueError(f"Invalid alphanumeric value {num}")
+                    segment += table[num]
+                    bits_idx += 6
+                else:
+                    break
+            result += segment
+
+        # Numeric mode
+        else:
+            """
+            Each group of digits is encoded differently:
+            3 digits → 10 bits
+            2 digits → 7 bits
+            1 digit → 4 bits
+            """
+            segment = ""
+            while len(segment) < count:
+                digits = min(count - len(segment), 3)
+                width = (0, 4, 7, 10)[digits]
+                if bits_idx + width > len(bit_str):
+                    break
+                num = int(bit_str[bits_idx:bits_idx+width], 2)
+                if num >= 10 ** digits:
+                    raise ValueError(f"Invalid numeric value {num}")
+                segment += f"{num:0{digits}d}"
+                bits_idx += width
+            result += segment
+
+    return result
+
+def read_structured_append(codewords: bytes) -> dict:
+    """
+    Read the Structured Append header at the start of the data, if there is one.
+    Returns {'index', 'total', 'parity'} or None.
+    """
+    if len(codewords) < 3 or codewords[0] >> 4 != constants.STRUCTURED_APPEND_INDICATOR:
+        return None
+    header = int.from_bytes(bytes(codewords[:3]), 'big') >> 4
+    return {'index': header >> 12 & 0xF, 'total': (header >> 8 & 0xF) + 1, 'parity': header & 0xFF}
 
-def decode_qr_matrix(matrix: np.array, version: int) -> str:
+def correct_codewords(matrix: np.array, version: int) -> tuple:
     """
-    Perform the full decoding.
-    Args:
-        module_matrix (list of list of int): The rescaled QR code matrix.
-        version (int): The version of the QR code.
-    Returns:
-        decoded_data (str or bytes): The interpreted data from the QR code.
+    Unmask the matrix, read the codewords, undo the interleaving and correct every block.
+    Returns (data codewords, number of corrected codewords), or (None, None)
+    if a block has too many errors.
     """
-    size = matrix.shape[0]
-    reserved = get_reserved_mask(version, size)
     fmt = extract_format_info(matrix)
     mask_pattern = fmt['mask_pattern']
-    unmasked_matrix = unmask_qr(matrix, mask_pattern, reserved)
-    data_bits = extract_data_bits(unmasked_matrix, reserved)
+    ec_level = fmt['ec_level']
+    unmasked_matrix = unmask_qr(matrix, mask_pattern, version)
+    data_bits = extract_data_bits(unmasked_matrix, version)
     codewords = bits_to_bytes(data_bits)
 
-    if version in constants.RS_PARAMS:
-        expected_codewords, ecc_count = constants.RS_PARAMS[version]
+    # Use only the expected number of codewords, and undo the interleaving of the blocks
+    raw_codewords = layout.num_raw_codewords(version)
+    codewords = np.frombuffer(bytes(codewords[:raw_codewords]), dtype=np.uint8)
+    block_codewords = np.empty(raw_codewords, dtype=np.uint8)
+    block_codewords[layout.interleave_order(version, ec_level)] = codewords
+
+    ecc_count = constants.ECC_CODEWORDS_PER_BLOCK[ec_level][version]
+    lengths = layout.block_data_lengths(version, ec_level)
+    blocks = np.split(block_codewords, np.cumsum([n + ecc_count for n in lengths])[:-1])
+
+    # blocks of the same length are corrected in one batch
+    data = []
+    corrected_count = 0
+    for length in sorted(set(lengths)):
+        group = np.array([block for block in blocks if len(block) == length + ecc_count])
+        corrected, counts = poly.rs_decode_batch(group, ecc_count)
+        if (counts < 0).any():
+            return None, None
+        data.extend(corrected[:, :length])
+        corrected_count += int(counts.sum())
+
+    return np.concatenate(data).tobytes(), corrected_count
+
+def decode_symbol(matrix: np.array, version: int = None) -> dict:
+    """
+    Decode one QR matrix (or a QRSymbol, which knows its version).
+    Returns {'text', 'structured_append', 'ec_level', 'mask', 'corrected', 'error'};
+    'corrected' is the number of codewords Reed-Solomon fixed and
+    'error' is None when decoding succeeded.
+    """
+    if isinstance(matrix, QRSymbol):
+        matrix, version = matrix.to_grid(), matrix.version
+    fmt = extract_format_info(matrix)
+    codewords, corrected = correct_codewords(matrix, version)
+    symbol = {'ec_level': fmt['ec_level'], 'mask': fmt['mask_pattern'], 'corrected': corrected}
+    if codewords is None:
+        symbol.update(text=None, structured_append=None, error="Error in RS decoding: Too many errors to correct")
     else:
-        return "Unsupported version for RS parameters."
-
-    # Use only the expected number of codewords
-    codewords = codewords[:expected_codewords]
-
-    try:
-        rsc = RSCodec(ecc_count)
-        decoded = rsc.decode(bytes(codewords))
-        # tuple returned (decoded data, metadats)
-        corrected = decoded[0]
-    except ReedSolomonError as e:
-        return "Error in RS decoding: " + str(e)
+        try:
+            symbol.update(text=decode_data(codewords, version),
+                          structured_append=read_structured_append(codewords), error=None)
+        except ValueError as e:
+            symbol.update(text=None, structured_append=None, error=f"Error in data decoding: {e}")
+    return symbol
 
-    return decode_data(corrected)
+def decode_qr_matrix(matrix: np.array, version: int = None) -> str:
+    """
+    Perform the full decoding.
+    Args:
+        module_matrix (list of list of int): The rescaled QR code matrix, or a QRSymbol.
+        version (int): The version of the QR code (not needed for a QRSymbol).
+    Returns:
+        decoded_data (str or bytes): The interpreted data from the QR code.
+    """
+    symbol = decode_symbol(matrix, version)
+    return symbol['error'] or symbol['text']
 
-def full_decode(image: np.array) -> str:
+def assemble_structured_append(symbols: list[dict]) -> str:
+    """
+    Join decoded symbols: the parts of a Structured Append sequence are put back in order
+    and checked against the parity byte, standalone symbols are returned one per line.
+    """
+    decoded = [symbol for symbol in symbols if symbol['error'] is None]
+    if not decoded:
+        return symbols[0]['error'] if symbols else "No QR code found."
+
+    parts = [symbol for symbol in decoded if symbol['structured_append'] is not None]
+    if not parts:
+        return '\n'.join(symbol['text'] for symbol in decoded)
+
+    # the sequence most of the parts belong to
+    total, parity = Counter((part['structured_append']['total'], part['structured_append']['parity'])
+                            for part in parts).most_common(1)[0][0]
+    by_index = {}
+    for part in parts:
+        header = part['structured_append']
+        if header['total'] == total and header['parity'] == parity:
+            by_index.setdefault(header['index'], part['text'])
+
+    missing = [i + 1 for i in range(total) if i not in by_index]
+    if missing:
+        return f"Structured append: missing symbol(s) {missing} of {total}"
+    text = ''.join(by_index[i] for i in range(total))
+
+    check = 0
+    for byte in text.encode('utf-8'):
+        check ^= byte
+    if check != parity:
+        return "Structured append: parity check failed"
+    return text
+
+def read_symbol(image: np.array) -> dict:
+    """
+    Detect the version of a cropped QR code, sample its module grid and decode it.
+    """
+    symbol = read_grid(image)
+    if symbol is None:
+        return {'text': None, 'structured_append': None, 'error': "Could not detect QR code version."}
+    if not is_qr_code(symbol.to_grid()):
+        return {'text': None, 'structured_append': None, 'error': "Not a valid QR code!"}
+    return decode_symbol(symbol)
+
+def full_decode(image: np.ndarray | list[np.ndarray], workers: int = 1) -> str:
     """
     Complete pipeline:
       - Read the image.
@@ -375,12 +739,16 @@ def full_decode(image: np.array) -> str:
       - Rescale to the appropriate grid.
       - Verify it appears to be a QR code.
       - Decode the QR matrix.
+    Given a list of cropped QR codes (e.g. the symbols of a Structured Append sequence),
+    every one is decoded, on `workers` threads, and the parts are reassembled.
     """
-    version = detect_version(image)
-    if version is None:
-        return "Could not detect QR code version."
-    grid_size = 21 + 4 * (version - 1)
-    module_matrix = rescale_to_grid(image, grid_size)
-    if not is_qr_code(module_matrix):
-        return "Not a valid QR code!"
-    return decode_qr_matrix(module_matrix, version)
+    if not isinstance(image, (list, tuple)):
+        symbol = read_symbol(image)
+        return symbol['error'] or symbol['text']
+
+    if workers > 1 and len(image) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            symbols = list(pool.map(read_symbol, image))
+    else:
+        symbols = [read_symbol(roi) for roi in image]
+    return assemble_structured_append(symbols)
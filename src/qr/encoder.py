@@ -1,117 +1,211 @@
-from qr.visualizer import QR_Visualizer
+from qr.visualizer import QR_Visualizer, OUTPUT_FORMATS
 from qr.builder import QRCodeBuilder
 import qr.constants as constants
+import qr.layout as layout
 import qr.poly as poly
+import qr.segments as segments
+from qr.bitbuffer import BitBuffer
+from qr.symbol import QRSymbol
+import numpy as np
+from PIL import Image
 import os
 
 #class for encoding data
 class Encoder:
-    def __init__(self, message: str) -> None:
+    def __init__(self, message: str, ec_level: str = 'M', version: int = None,
+                 structured_append: tuple[int, int, int] = None) -> None:
+        if ec_level not in constants.EC_LEVELS:
+            raise ValueError(f"Unknown error correction level: {ec_level!r}")
         self.message = message
-
-        # max no. of data bits for our specification(2.M) = 28, 28*4=224
-        self.max_data_bits = 224
-
-    def generate_ecc(self) -> str:
-        # For our specification(2.M), we have 16 ECC codewords
-        poly.create_gf_tables()
-        generator_polynomial = poly.gf_poly_gen(16)
-
-        message = self.encode_data_string()
-        message_polynomial = []
-        for i in range(0, len(message) - 7, 8):
-            bin_codeword = message[i:i + 8]
-            coef = int(bin_codeword, 2)
-            message_polynomial.append(coef)
-
-        ecc = poly.gf_poly_div(message_polynomial + [0] * (len(generator_polynomial) - 1), generator_polynomial)
-        ecc_bits = ''
-
-        for nmb in ecc:
-            bin_nmb = bin(nmb)[2:]
-            while len(bin_nmb) < 8:
-                bin_nmb = '0'+bin_nmb
-            ecc_bits += bin_nmb
-        return ecc_bits
-
-    def encode_data_string(self) -> str:
-        encoded = ''
-        # mode: binary
-        mode = '0100'
-
-        #size of message
-        char_count = bin(len(self.message))[2:]
-        while len(char_count) < 8:
-            char_count = '0' + char_count
-
-        #data bits
-        databits = ''
-        for ch in self.message:
-            ch_byte = bin(ord(ch))[2:]
-            while len(ch_byte) < 8:
-                ch_byte = '0' + ch_byte
-            databits += ch_byte
-
-        encoded += mode + char_count + databits
-
-        if len(encoded) > self.max_data_bits:
-            #cannot encode data
-            print('Cannot encode data! Data string too large!')
-            return ''
+        self.ec_level = ec_level
+
+        # (index, total, parity) when the message is one part of a Structured Append sequence
+        self.structured_append = structured_append
+        self.header_bits = 0
+        if structured_append is not None:
+            index, total, parity = structured_append
+            if not (1 <= total <= constants.MAX_STRUCTURED_APPEND_SYMBOLS and 0 <= index < total and 0 <= parity <= 0xFF):
+                raise ValueError(f"Invalid structured append header: {structured_append}")
+            self.header_bits = constants.STRUCTURED_APPEND_BITS
+
+        # unless a version is requested, use the smallest one the message fits in
+        self.version = version if version is not None else self.smallest_version()
+        if self.version not in range(1, 41):
+            raise ValueError(f"QR version must be between 1 and 40, got {self.version}")
+
+        # max no. of data bits for the chosen version and error correction level
+        self.max_data_bits = 8 * layout.num_data_codewords(self.version, self.ec_level)
+        self.segments = segments.optimal_segments(self.message, self.version)
+        needed = segments.segments_bits(self.segments, self.version)
+        if needed is None or self.header_bits + needed > self.max_data_bits:
+            raise ValueError(f'Cannot encode data! Data string too large for version {self.version}-{self.ec_level}!')
+
+    def smallest_version(self) -> int:
+        # the segmentation only changes with the character count widths (versions 1-9, 10-26, 27-40)
+        by_widths = {}
+        for version in range(1, 41):
+            widths = tuple(layout.char_count_bits(mode, version) for mode in segments.MODES)
+            if widths not in by_widths:
+                by_widths[widths] = segments.optimal_segments(self.message, version)
+            needed = segments.segments_bits(by_widths[widths], version)
+            if needed is not None and self.header_bits + needed <= 8 * layout.num_data_codewords(version, self.ec_level):
+                return version
+        raise ValueError('Cannot encode data! Data string too large!')
+
+    def split_blocks(self, data: BitBuffer) -> list[np.ndarray]:
+        # data codewords of every error correction block, short blocks first
+        codewords = np.frombuffer(data.to_bytes(), dtype=np.uint8)
+        lengths = layout.block_data_lengths(self.version, self.ec_level)
+        return np.split(codewords, np.cumsum(lengths)[:-1])
+
+    def generate_ecc(self, data: BitBuffer = None) -> list[np.ndarray]:
+        # ECC codewords of every block; blocks of the same length are encoded in one batch
+        if data is None:
+            data = self.encode_data_string()
+        ecc_count = constants.ECC_CODEWORDS_PER_BLOCK[self.ec_level][self.version]
+
+        ecc = []
+        blocks = self.split_blocks(data)
+        for length in sorted(set(len(block) for block in blocks)):
+            group = np.array([block for block in blocks if len(block) == length])
+            ecc.extend(poly.rs_encode_batch(group, ecc_count))
+        return ecc
+
+    def encode_data_string(self) -> BitBuffer:
+        encoded = BitBuffer()
+
+        if self.structured_append is not None:
+            index, total, parity = self.structured_append
+            encoded.append_bits(constants.STRUCTURED_APPEND_INDICATOR, 4)
+            encoded.append_bits(index, 4)
+            encoded.append_bits(total - 1, 4)
+            encoded.append_bits(parity, 8)
+
+        # mode, size and data bits of every segment
+        for segment in self.segments:
+            segment.write(encoded, self.version)
 
         #add terminator
         diff = self.max_data_bits - len(encoded)
         if diff > 4:
-            encoded += '0' * 4
-            r = len(encoded) % 8
-            if r % 8 != 0:
-                encoded += '0' * (8 - r)
-
+            encoded.append_bits(0, 4)
             #add pad bytes
-            if len(encoded) < self.max_data_bits:
-                pads = ['11101100', '00010001']
-                i = 0
-                while len(encoded) < self.max_data_bits:
-                    encoded += pads[i]
-                    i = (i+1) % 2
+            encoded.pad(self.max_data_bits, pattern=bytes([0b11101100, 0b00010001]))
         else:
-            encoded += '0' * diff
+            encoded.append_bits(0, diff)
         return encoded
 
-    def get_encoded(self) -> str:
-        return self.encode_data_string() + self.generate_ecc() + '0'*7
-
-def encode_text(text: str) -> None:
-    base = QRCodeBuilder()
-    encoder = Encoder(text)
-    encoded_data = encoder.get_encoded()
-    base.load_stream_in_qr(encoded_data)
-
-    interface = QR_Visualizer(base)
+    def get_encoded(self) -> BitBuffer:
+        data = self.encode_data_string()
+        blocks = self.split_blocks(data)
+        ecc = self.generate_ecc(data)
 
-    base.apply_best_mask()
-    print(interface.qr_to_terminal())
-    
-    interface.save_image(path=os.path.join(constants.PROJECT_ROOT,'src', 'qr'))
-    print('QR Code saved as qr_code.png')
+        # interleave the codewords of all the blocks
+        codewords = np.concatenate([part for pair in zip(blocks, ecc) for part in pair])
+        codewords = codewords[layout.interleave_order(self.version, self.ec_level)]
 
+        encoded = BitBuffer()
+        encoded.append_bytes(codewords.tobytes())
+        # remainder bits
+        encoded.append_bits(0, len(layout.data_module_coords(self.version)[0]) % 8)
+        return encoded
 
-def generateQR(text: str) ->None:
-    if len(text) >= 27:
+def structured_append_parity(text: str) -> int:
+    # XOR of all the bytes of the whole payload
+    parity = 0
+    for byte in text.encode('utf-8'):
+        parity ^= byte
+    return parity
+
+def split_structured_append(text: str, ec_level: str = 'M', version: int = None) -> list[Encoder]:
+    """
+    Encode one payload into a sequence of up to 16 symbols (Structured Append).
+    The text is cut into the fewest equal parts that each fit in the given version
+    (or in any version when None). A text that fits in a single symbol gets no header.
+    """
+    try:
+        return [Encoder(text, ec_level, version)]
+    except ValueError:
+        pass
+
+    parity = structured_append_parity(text)
+    for total in range(2, min(constants.MAX_STRUCTURED_APPEND_SYMBOLS, len(text)) + 1):
+        bounds = [round(i * len(text) / total) for i in range(total + 1)]
+        try:
+            return [Encoder(text[bounds[i]:bounds[i + 1]], ec_level, version, (i, total, parity))
+                    for i in range(total)]
+        except ValueError:
+            continue
+    raise ValueError(f'Cannot encode data! Data string too large for {constants.MAX_STRUCTURED_APPEND_SYMBOLS} symbols!')
+
+def build_qr(encoder: Encoder, mask_policy: str | int = 'exhaustive') -> tuple[QRCodeBuilder, int, int]:
+    # place the encoded data and apply the mask, returns (builder, mask, penalty)
+    base = QRCodeBuilder(encoder.version, encoder.ec_level)
+    base.load_stream_in_qr(encoder.get_encoded())
+    mask, penalty = base.apply_best_mask(mask_policy)
+    return base, mask, penalty
+
+def encode_text(text: str, mask_policy: str | int = 'exhaustive', ec_level: str = 'M', version: int = None,
+                structured_append: bool = False, output: str = 'rgb', module_size: int = None) -> None:
+    encoders = split_structured_append(text, ec_level, version) if structured_append else [Encoder(text, ec_level, version)]
+
+    for i, encoder in enumerate(encoders):
+        base, mask, penalty = build_qr(encoder, mask_policy)
+        interface = QR_Visualizer(base, module_size=module_size)
+
+        print(interface.qr_to_terminal())
+        if len(encoders) > 1:
+            print(f'Symbol {i + 1} of {len(encoders)}')
+        print(f'Version: {encoder.version}-{encoder.ec_level}, mask: {mask} (policy: {mask_policy}, penalty: {penalty})')
+
+        extension = OUTPUT_FORMATS[output]
+        filename = f'qr_code.{extension}' if len(encoders) == 1 else f'qr_code_{i + 1}.{extension}'
+        interface.save_image(filename=filename, path=os.path.join(constants.PROJECT_ROOT,'src', 'qr'), output=output)
+        print(f'QR Code saved as {filename}')
+
+
+# In-memory API: nothing is read from or written to disk, every call works on its own builder,
+# so these can run concurrently (e.g. from a thread pool)
+
+def encode_matrix(text: str, mask_policy: str | int = 'exhaustive', ec_level: str = 'M', version: int = None) -> np.ndarray:
+    # the module matrix: 0 = black, 1 = white
+    base, _, _ = build_qr(Encoder(text, ec_level, version), mask_policy)
+    return base.get_matrix().copy()
+
+def encode_symbol(text: str, mask_policy: str | int = 'exhaustive', ec_level: str = 'M', version: int = None) -> QRSymbol:
+    # the modules packed 8 per byte, for holding many symbols in memory
+    base, _, _ = build_qr(Encoder(text, ec_level, version), mask_policy)
+    return base.to_symbol()
+
+def encode_image(text: str, mask_policy: str | int = 'exhaustive', ec_level: str = 'M', version: int = None,
+                 img_size: int = None, module_size: int = None, quiet_zone: int = 1) -> Image.Image:
+    base, _, _ = build_qr(Encoder(text, ec_level, version), mask_policy)
+    interface = QR_Visualizer(base, img_size, module_size, quiet_zone)
+    interface.write_image()
+    return interface.img
+
+def encode_bytes(text: str, output: str = 'rgb', mask_policy: str | int = 'exhaustive', ec_level: str = 'M',
+                 version: int = None, img_size: int = None, module_size: int = None, quiet_zone: int = 1) -> bytes:
+    # the file contents in one of the OUTPUT_FORMATS
+    base, _, _ = build_qr(Encoder(text, ec_level, version), mask_policy)
+    return QR_Visualizer(base, img_size, module_size, quiet_zone).to_bytes(output)
+
+def generateQR(text: str, mask_policy: str | int = 'exhaustive', ec_level: str = 'M') -> dict:
+    try:
+        encoder = Encoder(text, ec_level)
+    except ValueError:
         return None
 
-    base = QRCodeBuilder()
-    encoder = Encoder(text)
-
-    encoded = encoder.get_encoded()
-    base.load_stream_in_qr(encoded)
-    mask = base.apply_best_mask()
+    base, mask, penalty = build_qr(encoder, mask_policy)
 
     interface = QR_Visualizer(base)
-    interface.save_image(path=os.path.join(constants.PROJECT_ROOT,'src', 'qr'))
+    interface.write_image()
 
     res = {}
-    res['mask'] = mask[0]
-    res['mask-penalty'] = mask[1]
+    res['version'] = encoder.version
+    res['ec-level'] = encoder.ec_level
+    res['mask'] = mask
+    res['mask-penalty'] = penalty
+    res['mask-policy'] = mask_policy
+    res['image'] = interface.img
     return res
-
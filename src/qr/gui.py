@@ -36,19 +36,21 @@ class App(tk.Tk):
 
         self.show_rectangle = True
         self.last_file = None
+        self.qr_image = None
 
     def generate(self, text_string):
-        info = generateQR(text_string)
+        info = generateQR(text_string, self.maskPolicy.get(), self.ecLevel.get())
         if info is None:
-            details_text = f"Sorry. Too many characters ({len(text_string)})!\nMax number of characters is 26.\n"
+            details_text = (f"Sorry. Too many characters ({len(text_string)})!\n"
+                             f"The text doesn't fit in a version 40-{self.ecLevel.get()} QR code.\n")
             self.detailsLabel.config(text=details_text)
             return
 
         for widget in self.imageArea.winfo_children():
             widget.destroy()
 
-        image = Image.open(os.path.join(constants.PROJECT_ROOT,'src', 'qr', 'qr_code.png'))
-        image = image.resize((550, 550))
+        self.qr_image = info['image']
+        image = self.qr_image.resize((550, 550))
         photo = ImageTk.PhotoImage(image)
 
         self.qr_image_label = tk.Label(self.imageArea, image=photo)
@@ -56,10 +58,11 @@ class App(tk.Tk):
         self.qr_image_label.image = photo
 
         details_text = (
-            f"QR Version: 2 \n"
-            f"Error Correction Level: M \n"
+            f"QR Version: {info['version']} \n"
+            f"Error Correction Level: {info['ec-level']} \n"
             f"Characters entered: {len(text_string)}\n"
             f"Applied Mask: {info['mask']}\n"
+            f"Mask Policy: {info['mask-policy']}\n"
             f"Mask Penalty: {info['mask-penalty']}"
         )
         self.detailsLabel.config(text=details_text)
@@ -75,6 +78,23 @@ class App(tk.Tk):
         self.strEntry = tk.Entry(self.userArea, font=("Arial", 12))
         self.strEntry.pack(pady=5, fill="x", padx=10)
 
+        ecLabel = tk.Label(self.userArea, text="Error correction level:", font=("Arial", 12), bg='lightblue')
+        ecLabel.pack(pady=5, fill="x", padx=10)
+
+        self.ecLevel = tk.StringVar(self.userArea, value='M')
+        ecMenu = tk.OptionMenu(self.userArea, self.ecLevel, 'L', 'M', 'Q', 'H')
+        ecMenu.config(font=("Arial", 12))
+        ecMenu.pack(pady=5, fill="x", padx=10)
+
+        maskLabel = tk.Label(self.userArea, text="Mask selection:", font=("Arial", 12), bg='lightblue')
+        maskLabel.pack(pady=5, fill="x", padx=10)
+
+        self.maskPolicy = tk.StringVar(self.userArea, value='exhaustive')
+        maskOptions = ['exhaustive', 'heuristic'] + [f'fixed={i}' for i in range(8)]
+        maskMenu = tk.OptionMenu(self.userArea, self.maskPolicy, *maskOptions)
+        maskMenu.config(font=("Arial", 12))
+        maskMenu.pack(pady=5, fill="x", padx=10)
+
         generateButton = tk.Button(self.userArea, font=("Arial", 12),
                     text="Generate QR!", command=lambda: self.generate(self.strEntry.get()))
         generateButton.pack(pady=5, fill="y", padx=10)
@@ -94,7 +114,7 @@ class App(tk.Tk):
         infoLabel = tk.Label(self.infoArea, text = "Information:", font=("Arial", 12), bg='lightblue')
         infoLabel.pack()
 
-        self.detailsLabel = tk.Label(self.infoArea, text = 'QR Version: 2 \n Error Correction Level: M \n', font=('Arial', 12), bg='lightblue')
+        self.detailsLabel = tk.Label(self.infoArea, text = 'QR Version: - \n Error Correction Level: M \n', font=('Arial', 12), bg='lightblue')
         self.detailsLabel.pack()
 
         self.infoArea.pack(side='bottom', fill='both', expand=False)
@@ -123,8 +143,7 @@ class App(tk.Tk):
             try:
                 # Copy current QR code to selected location 
                 # Set resolution as 250x250 because otherwise the morphological operations will not work
-                image = Image.open(os.path.join(constants.PROJECT_ROOT,'src', 'qr', 'qr_code.png'))
-                image = image.resize((250, 250))
+                image = self.qr_image.resize((250, 250))
                 image.save(file_path)
                 tk.messagebox.showinfo("Success", "QR Code saved successfully!")
             except Exception as e:
@@ -0,0 +1,227 @@
+import functools
+import numpy as np
+import qr.constants as constants
+
+# Module layout shared by the builder (placing data) and the decoder (reading it)
+
+def symbol_size(version: int) -> int:
+    return 17 + 4 * version
+
+def char_count_bits(mode: str, version: int) -> int:
+    return constants.CHAR_COUNT_BITS[mode][0 if version <= 9 else 1 if version <= 26 else 2]
+
+def alignment_centers(version: int) -> list[tuple[int, int]]:
+    # every (row, col) alignment center that doesn't overlap a finder pattern
+    if version < 2:
+        return []
+    size = symbol_size(version)
+    centers = constants.ALIGNMENT_CENTERS[version]
+    return [(r, c) for r in centers for c in centers
+            if not ((r < 9 and c < 9) or (r < 9 and c >= size - 8) or (r >= size - 8 and c < 9))]
+
+def format_string(ec_level: str, mask: int) -> str:
+    """
+    The 15 format information bits: EC level and mask, a BCH(15, 5) remainder and the XOR mask.
+    """
+    data = (constants.EC_LEVEL_BITS[ec_level] << 3) | mask
+    rem = data << 10
+    for i in range(14, 9, -1):
+        if rem >> i & 1:
+            rem ^= constants.FORMAT_GENERATOR << (i - 10)
+    return f'{((data << 10) | rem) ^ constants.FORMAT_XOR_MASK:015b}'
+
+def version_bits(version: int) -> int:
+    # 6 version bits followed by a BCH(18, 6) remainder
+    rem = version << 12
+    for i in range(17, 11, -1):
+        if rem >> i & 1:
+            rem ^= constants.VERSION_GENERATOR << (i - 12)
+    return (version << 12) | rem
+
+def format_coords(size: int) -> tuple[list, list]:
+    """
+    Module coordinates of the two copies of the format information, most significant bit first.
+    """
+    top_left = [(8, 0), (8, 1), (8, 2), (8, 3), (8, 4), (8, 5),
+                (8, 7), (8, 8), (7, 8), (5, 8), (4, 8), (3, 8),
+                (2, 8), (1, 8), (0, 8)]
+    split = [(size - 1 - i, 8) for i in range(7)] + [(8, size - 8 + i) for i in range(8)]
+    return top_left, split
+
+def version_coords(size: int) -> tuple[list, list]:
+    """
+    Module coordinates of the two copies of the version information (versions >= 7),
+    least significant bit first.
+    """
+    bottom_left = [(size - 11 + i % 3, i // 3) for i in range(18)]
+    top_right = [(c, r) for r, c in bottom_left]
+    return bottom_left, top_right
+
+@functools.lru_cache(maxsize=None)
+def reserved_mask(version: int) -> np.ndarray:
+    """
+    Build a mask marking modules reserved for:
+      - Finder patterns (and their separators)
+      - Timing patterns (row 6 and column 6)
+      - Format information areas (near the finders)
+      - Alignment patterns (for versions >= 2)
+      - Version information areas (for versions >= 7)
+    The mask is cached per version and read-only.
+    """
+    size = symbol_size(version)
+    reserved = np.zeros((size, size), dtype=bool)
+    # Finder patterns, separators and format information
+    reserved[0:9, 0:9] = True           # top-left
+    reserved[0:9, size-8:size] = True   # top-right
+    reserved[size-8:size, 0:9] = True   # bottom-left
+
+    # Timing patterns
+    reserved[6, :] = True
+    reserved[:, 6] = True
+
+    # Alignment patterns
+    for r, c in alignment_centers(version):
+        reserved[r-2:r+3, c-2:c+3] = True
+
+    # Version information
+    if version >= 7:
+        reserved[size-11:size-8, 0:6] = True
+        reserved[0:6, size-11:size-8] = True
+
+    reserved.setflags(write=False)
+    return reserved
+
+@functools.lru_cache(maxsize=None)
+def function_template(version: int) -> np.ndarray:
+    """
+    Builder matrix with every function pattern drawn in:
+    0 = black, 1 = white, 2 = reserved for format information, 4 = free for data.
+    The template is cached per version and read-only; builders work on a copy.
+    """
+    size = symbol_size(version)
+    template = np.full((size, size), 4, dtype=np.uint8)
+
+    finder = np.zeros((7, 7), dtype=np.uint8)
+    finder[1:6, 1:6] = 1
+    finder[2:5, 2:5] = 0
+    for r, c in ((0, 0), (0, size - 7), (size - 7, 0)):
+        template[r:r+7, c:c+7] = finder
+
+    # Separators
+    template[7, 0:8] = template[0:8, 7] = 1
+    template[7, size-8:] = template[0:8, size-8] = 1
+    template[size-8, 0:8] = template[size-8:, 7] = 1
+
+    # Timing patterns: black on even positions
+    timing = np.arange(8, size - 8) % 2
+    template[6, 8:size-8] = timing
+    template[8:size-8, 6] = timing
+
+    alignment = np.zeros((5, 5), dtype=np.uint8)
+    alignment[1:4, 1:4] = 1
+    alignment[2, 2] = 0
+    for r, c in alignment_centers(version):
+        template[r-2:r+3, c-2:c+3] = alignment
+
+    # Format information (filled in with the mask), plus the dark module
+    for coords in format_coords(size):
+        rows, cols = zip(*coords)
+        template[rows, cols] = 2
+    template[size - 8, 8] = 0
+
+    # Version information doesn't depend on the mask, so it is drawn right away
+    if version >= 7:
+        bits = version_bits(version)
+        for coords in version_coords(size):
+            for i, (r, c) in enumerate(coords):
+                template[r, c] = 0 if bits >> i & 1 else 1
+
+    template.setflags(write=False)
+    return template
+
+@functools.lru_cache(maxsize=None)
+def data_module_coords(version: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (rows, cols) of every data module, in the order the data bits are placed:
+    two columns at a time from the right edge, alternating upwards and downwards,
+    skipping the vertical timing pattern column.
+    The arrays are cached per version and read-only.
+    """
+    size = symbol_size(version)
+    rows, cols = [], []
+    upward = True
+    col = size - 1
+    while col > 0:
+        if col == 6:  # Skip the timing pattern column
+            col -= 1
+        line = np.arange(size - 1, -1, -1) if upward else np.arange(size)
+        # right module of the pair first, then the left one
+        rows.append(np.repeat(line, 2))
+        cols.append(np.tile([col, col - 1], size))
+        upward = not upward
+        col -= 2
+
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    free = ~reserved_mask(version)[rows, cols]
+    rows, cols = rows[free], cols[free]
+
+    rows.setflags(write=False)
+    cols.setflags(write=False)
+    return rows, cols
+
+@functools.lru_cache(maxsize=None)
+def mask_patterns(size: int) -> np.ndarray:
+    # (8, size, size) boolean array, True where mask k flips the module
+    i, j = np.indices((size, size))
+    patterns = np.stack([constants.MASK_CONDITIONS[k](i, j) for k in range(8)])
+    patterns.setflags(write=False)
+    return patterns
+
+@functools.lru_cache(maxsize=None)
+def data_mask_patterns(version: int) -> np.ndarray:
+    """
+    The 8 mask patterns restricted to the data modules of the given version,
+    so applying or removing a mask is a single XOR with one of them.
+    """
+    patterns = mask_patterns(symbol_size(version)) & ~reserved_mask(version)
+    patterns.setflags(write=False)
+    return patterns
+
+def num_raw_codewords(version: int) -> int:
+    return len(data_module_coords(version)[0]) // 8
+
+def num_data_codewords(version: int, ec_level: str) -> int:
+    ecc = constants.ECC_CODEWORDS_PER_BLOCK[ec_level][version]
+    blocks = constants.NUM_ERROR_CORRECTION_BLOCKS[ec_level][version]
+    return num_raw_codewords(version) - ecc * blocks
+
+def block_data_lengths(version: int, ec_level: str) -> list[int]:
+    """
+    Number of data codewords in every block. Blocks are ordered short ones first,
+    the long ones hold one extra data codeword.
+    """
+    blocks = constants.NUM_ERROR_CORRECTION_BLOCKS[ec_level][version]
+    short, long_count = divmod(num_data_codewords(version, ec_level), blocks)
+    return [short] * (blocks - long_count) + [short + 1] * long_count
+
+@functools.lru_cache(maxsize=None)
+def interleave_order(version: int, ec_level: str) -> np.ndarray:
+    """
+    Index array mapping the block-by-block codeword sequence
+    (data 0, ecc 0, data 1, ecc 1, ...) to the interleaved order in the symbol:
+    symbol_codewords = block_codewords[order].
+    """
+    lengths = block_data_lengths(version, ec_level)
+    ecc = constants.ECC_CODEWORDS_PER_BLOCK[ec_level][version]
+    starts = np.cumsum([0] + [n + ecc for n in lengths[:-1]])
+
+    # data: column i of every block that is long enough, then the ecc columns
+    longest = max(lengths)
+    data_idx = starts[:, None] + np.arange(longest)[None, :]
+    data_idx = data_idx.T[np.arange(longest)[:, None] < np.array(lengths)[None, :]]
+    ecc_idx = (starts + np.array(lengths))[:, None] + np.arange(ecc)[None, :]
+
+    order = np.concatenate([data_idx, ecc_idx.T.reshape(-1)])
+    order.setflags(write=False)
+    return order
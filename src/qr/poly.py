@@ -1,54 +1,289 @@
+import functools
 import numpy as np
 
 # The irreducible polynomial for GF(256)
 MOD_POLY = 0x11d
 
-gf_exp = np.ones(512, dtype=int)
-gf_log = np.zeros(256, dtype=int)
-
-def create_gf_tables() -> None:
+def create_gf_tables() -> tuple[np.ndarray, np.ndarray]:
+    exp = np.ones(512, dtype=np.uint8)
+    log = np.zeros(256, dtype=np.intp)
     x = 1
     for i in range(255):
-        gf_exp[i] = x
-        gf_log[x] = i
+        exp[i] = x
+        log[x] = i
         x <<= 1
         if x & 0x100:
             x ^= MOD_POLY
-    
-    for i in range(255, 512):
-        gf_exp[i] = gf_exp[i - 255]
 
-def gf_mult(x: int, y: int, field_size: int = 256) -> int:
-    if x == 0 or y == 0:
+    # doubled so that exp[log[x] + log[y]] never needs a modulo
+    exp[255:510] = exp[0:255]
+    exp[510:512] = exp[0:2]
+    return exp, log
+
+def create_mult_table(exp: np.ndarray, log: np.ndarray) -> np.ndarray:
+    # full 256x256 product table, row/column 0 are the zero products
+    table = exp[log[:, None] + log[None, :]]
+    table[0, :] = 0
+    table[:, 0] = 0
+    return table
+
+# The tables are built once, at import time, and never written to afterwards
+gf_exp, gf_log = create_gf_tables()
+gf_mult_table = create_mult_table(gf_exp, gf_log)
+gf_inverse = gf_exp[255 - gf_log]
+gf_inverse[0] = 0
+
+for _table in (gf_exp, gf_log, gf_mult_table, gf_inverse):
+    _table.setflags(write=False)
+
+def gf_mult(x, y):
+    # works for scalars and for (broadcastable) arrays alike
+    return gf_mult_table[x, y]
+
+def gf_div(x, y):
+    if np.any(np.asarray(y) == 0):
+        raise ZeroDivisionError("division by zero in GF(256)")
+    return gf_mult_table[x, gf_inverse[y]]
+
+def gf_pow(x: int, power: int) -> int:
+    if x == 0:
         return 0
-    return gf_exp[(gf_log[x] + gf_log[y]) % (field_size - 1)]
+    return int(gf_exp[(gf_log[x] * power) % 255])
+
+def gf_poly_scale(p: np.ndarray, x: int) -> np.ndarray:
+    return gf_mult_table[np.asarray(p, dtype=np.uint8), x]
+
+def gf_poly_add(p1: np.ndarray, p2: np.ndarray) -> np.ndarray:
+    p1 = np.asarray(p1, dtype=np.uint8)
+    p2 = np.asarray(p2, dtype=np.uint8)
+    res = np.zeros(max(len(p1), len(p2)), dtype=np.uint8)
+    res[len(res) - len(p1):] = p1
+    res[len(res) - len(p2):] ^= p2
+    return res
 
 # I wanted to multiply two polynomials using FFT (actually NTT)
 # Then I realized I'm coding in Python so efficiency is worthless
 # (Actually I just ran into issues with GF and radix 2 FFT)
+# So instead: take the outer product through the table, skew row i right by i
+# places and XOR the rows together.
 def gf_poly_mult(p1: np.ndarray, p2: np.ndarray) -> np.ndarray:
-    res = np.zeros(len(p1) + len(p2) - 1, dtype=int)
-    for i in range(len(p1)):
-        for j in range(len(p2)):
-            res[i + j] ^= gf_mult(p1[i], p2[j])
-    return res
+    p1 = np.asarray(p1, dtype=np.uint8)
+    p2 = np.asarray(p2, dtype=np.uint8)
+    n1, n2 = len(p1), len(p2)
+    width = n1 + n2 - 1
+
+    skewed = np.zeros((n1, width + 1), dtype=np.uint8)
+    skewed[:, :n2] = gf_mult_table[p1[:, None], p2[None, :]]
+    # reading the padded rows with a stride one shorter shifts row i by i columns
+    skewed = skewed.reshape(-1)[:n1 * width].reshape(n1, width)
+    return np.bitwise_xor.reduce(skewed, axis=0)
+
+def gf_poly_eval(p: np.ndarray, x) -> np.ndarray:
+    # evaluates p (highest degree first) at every point of x in one pass
+    p = np.asarray(p, dtype=np.uint8)
+    x = np.asarray(x, dtype=np.uint8)
+    powers = np.arange(len(p) - 1, -1, -1)
+
+    x_pow = gf_exp[(gf_log[x][..., None] * powers) % 255]
+    # 0^k is 0 for every k > 0, 0^0 stays 1
+    x_pow = np.where(x[..., None] == 0, powers == 0, x_pow).astype(np.uint8)
+
+    return np.bitwise_xor.reduce(gf_mult_table[p, x_pow], axis=-1)
 
 def gf_poly_gen(degree: int) -> np.ndarray:
-    gen = np.array([1], dtype=int)
+    gen = np.array([1], dtype=np.uint8)
     for i in range(degree):
-        gen = gf_poly_mult(gen, np.array([1, gf_exp[i]], dtype=int))
+        gen = gf_poly_mult(gen, np.array([1, gf_exp[i]], dtype=np.uint8))
     return gen
 
 def gf_poly_div(dividend: np.ndarray, divisor: np.ndarray) -> np.ndarray:
-    msg_out = list(dividend)
+    msg_out = np.array(dividend, dtype=np.uint8)
+    divisor = np.asarray(divisor, dtype=np.uint8)
     divisor_degree = len(divisor) - 1
+    # row of products of the (normalized) divisor with every possible coefficient
+    lead_inv = gf_inverse[divisor[0]]
+    products = gf_mult_table[:, divisor[1:]]
 
-    for i in range(len(dividend) - divisor_degree):
-        coef = msg_out[i]
+    for i in range(len(msg_out) - divisor_degree):
+        coef = gf_mult_table[msg_out[i], lead_inv]
         if coef != 0:
-            for j in range(len(divisor)):
-                msg_out[i + j] ^= gf_mult(divisor[j], coef)
+            msg_out[i + 1:i + 1 + divisor_degree] ^= products[coef]
 
-    remainder = msg_out[-divisor_degree:]
+    remainder = msg_out[len(msg_out) - divisor_degree:]
     return remainder
 
+@functools.lru_cache(maxsize=None)
+def rs_generator_poly(ecc_count: int) -> np.ndarray:
+    # generator polynomials only depend on the number of ECC codewords
+    gen = gf_poly_gen(ecc_count)
+    gen.setflags(write=False)
+    return gen
+
+def rs_encode_batch(data: np.ndarray, ecc_count: int) -> np.ndarray:
+    """
+    Reed-Solomon encode many messages of the same length at once.
+    Args:
+        data (np.ndarray): (N, k) uint8 array, one row of data codewords per message.
+        ecc_count (int): Number of ECC codewords per message.
+    Returns:
+        np.ndarray: (N, ecc_count) uint8 array with the parity codewords of every row.
+    """
+    data = np.asarray(data, dtype=np.uint8)
+    if data.ndim != 2:
+        raise ValueError(f"expected an (N, k) array of codewords, got shape {data.shape}")
+
+    # products[c] is the generator (without its leading 1) scaled by c
+    products = gf_mult_table[:, rs_generator_poly(ecc_count)[1:]]
+    parity = np.zeros((data.shape[0], ecc_count), dtype=np.uint8)
+
+    # the division as a shift register: one step per data column, all rows at once
+    for k in range(data.shape[1]):
+        feedback = data[:, k] ^ parity[:, 0]
+        parity[:, :-1] = parity[:, 1:]
+        parity[:, -1] = 0
+        parity ^= products[feedback]
+    return parity
+
+class ReedSolomonError(Exception):
+    pass
+
+def rs_syndromes_batch(blocks: np.ndarray, ecc_count: int) -> np.ndarray:
+    # S_j = c(alpha^j) for j = 0..ecc_count-1, Horner's rule over the columns of every block
+    blocks = np.asarray(blocks, dtype=np.uint8)
+    alphas = gf_exp[:ecc_count]
+    synd = np.zeros((blocks.shape[0], ecc_count), dtype=np.uint8)
+    for k in range(blocks.shape[1]):
+        synd = gf_mult_table[synd, alphas] ^ blocks[:, k, None]
+    return synd
+
+def rs_errata_locator(coef_pos: list) -> np.ndarray:
+    # product of (1 + x * alpha^i) over all the errata coefficient positions
+    loc = np.array([1], dtype=np.uint8)
+    for i in coef_pos:
+        loc = gf_poly_mult(loc, np.array([gf_pow(2, i), 1], dtype=np.uint8))
+    return loc
+
+def rs_error_evaluator(synd: np.ndarray, err_loc: np.ndarray, ecc_count: int) -> np.ndarray:
+    # omega(x) = S(x) * lambda(x) mod x^(ecc_count + 1)
+    divisor = np.zeros(ecc_count + 2, dtype=np.uint8)
+    divisor[0] = 1
+    return gf_poly_div(gf_poly_mult(synd, err_loc), divisor)
+
+def rs_forney_syndromes(synd: np.ndarray, erase_pos: list, n: int) -> np.ndarray:
+    # syndromes with the erasures factored out, so Berlekamp-Massey only sees the errors
+    fsynd = np.array(synd[1:], dtype=np.uint8)
+    for p in erase_pos:
+        x = gf_pow(2, n - 1 - p)
+        fsynd[:-1] = gf_mult_table[fsynd[:-1], x] ^ fsynd[1:]
+    return fsynd
+
+def rs_find_error_locator(fsynd: np.ndarray, ecc_count: int, erase_count: int = 0) -> np.ndarray:
+    # Berlekamp-Massey
+    err_loc = np.array([1], dtype=np.uint8)
+    old_loc = np.array([1], dtype=np.uint8)
+    synd_shift = len(fsynd) - ecc_count if len(fsynd) > ecc_count else 0
+
+    for i in range(ecc_count - erase_count):
+        k = i + synd_shift
+        # discrepancy between the syndrome and what the current locator predicts
+        delta = int(fsynd[k])
+        j = np.arange(1, min(len(err_loc), k + 1))
+        if len(j):
+            delta ^= int(np.bitwise_xor.reduce(gf_mult_table[err_loc[-(j + 1)], fsynd[k - j]]))
+        old_loc = np.append(old_loc, np.uint8(0))
+        if delta != 0:
+            if len(old_loc) > len(err_loc):
+                new_loc = gf_poly_scale(old_loc, delta)
+                old_loc = gf_poly_scale(err_loc, gf_inverse[delta])
+                err_loc = new_loc
+            err_loc = gf_poly_add(err_loc, gf_poly_scale(old_loc, delta))
+
+    err_loc = np.trim_zeros(err_loc, 'f')
+    errs = len(err_loc) - 1
+    if (errs - erase_count) * 2 + erase_count > ecc_count:
+        raise ReedSolomonError("Too many errors to correct")
+    return err_loc
+
+def rs_find_errors(err_loc: np.ndarray, n: int) -> list:
+    # Chien search: every position is tried at once
+    roots = np.flatnonzero(gf_poly_eval(err_loc, gf_exp[:n]) == 0)
+    if len(roots) != len(err_loc) - 1:
+        raise ReedSolomonError("Could not locate the errors (Chien search found the wrong number of roots)")
+    return [n - 1 - int(i) for i in roots]
+
+def rs_correct_errata(block: np.ndarray, synd: np.ndarray, err_pos: list) -> np.ndarray:
+    # Forney: compute the error magnitudes for the known errata positions
+    n = len(block)
+    coef_pos = [n - 1 - p for p in err_pos]
+    err_loc = rs_errata_locator(coef_pos)
+    err_eval = rs_error_evaluator(synd[::-1], err_loc, len(err_loc) - 1)[::-1]
+
+    X = [gf_pow(2, -(255 - c)) for c in coef_pos]
+    magnitudes = np.zeros(n, dtype=np.uint8)
+    for i, Xi in enumerate(X):
+        Xi_inv = int(gf_inverse[Xi])
+        err_loc_prime = 1
+        for j, Xj in enumerate(X):
+            if j != i:
+                err_loc_prime = int(gf_mult_table[err_loc_prime, 1 ^ int(gf_mult_table[Xi_inv, Xj])])
+        if err_loc_prime == 0:
+            raise ReedSolomonError("Could not find error magnitude")
+        y = int(gf_mult_table[Xi, gf_poly_eval(err_eval[::-1], Xi_inv)])
+        magnitudes[err_pos[i]] = gf_div(y, err_loc_prime)
+    return block ^ magnitudes
+
+def rs_correct_block(block: np.ndarray, synd: np.ndarray, ecc_count: int, erase_pos: list = ()) -> tuple[np.ndarray, int]:
+    n = len(block)
+    erase_pos = list(erase_pos)
+    # leading 0 keeps the syndrome indices aligned with the powers of alpha
+    synd = np.concatenate(([0], synd)).astype(np.uint8)
+    fsynd = rs_forney_syndromes(synd, erase_pos, n)
+    err_loc = rs_find_error_locator(fsynd, ecc_count, erase_count=len(erase_pos))
+    err_pos = rs_find_errors(err_loc[::-1], n)
+    errata = erase_pos + [p for p in err_pos if p not in erase_pos]
+
+    corrected = rs_correct_errata(block, synd, errata)
+    if rs_syndromes_batch(corrected[None, :], ecc_count).any():
+        raise ReedSolomonError("Could not correct message")
+    return corrected, int(np.count_nonzero(corrected != block))
+
+def rs_decode_batch(blocks: np.ndarray, ecc_count: int, erasures: list = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reed-Solomon decode many blocks of the same length at once.
+    Args:
+        blocks (np.ndarray): (N, n) uint8 array, one received codeword block per row.
+        ecc_count (int): Number of ECC codewords at the end of every block.
+        erasures (list): Optional list with a sequence of known-bad positions per block.
+    Returns:
+        tuple: The (N, n) corrected blocks and an (N,) array with the number of corrected
+        codewords per block, -1 for blocks that could not be corrected.
+    Only blocks with a nonzero syndrome go through Berlekamp-Massey, Chien search and Forney.
+    """
+    blocks = np.array(blocks, dtype=np.uint8)
+    if blocks.ndim != 2:
+        raise ValueError(f"expected an (N, n) array of codewords, got shape {blocks.shape}")
+    counts = np.zeros(blocks.shape[0], dtype=np.intp)
+
+    if erasures is not None:
+        for row, erase_pos in enumerate(erasures):
+            if len(erase_pos) > 0:
+                blocks[row, list(erase_pos)] = 0
+
+    synd = rs_syndromes_batch(blocks, ecc_count)
+    for row in np.flatnonzero(synd.any(axis=1)):
+        erase_pos = [] if erasures is None else [int(p) for p in erasures[row]]
+        try:
+            if len(erase_pos) > ecc_count:
+                raise ReedSolomonError("Too many erasures to correct")
+            blocks[row], counts[row] = rs_correct_block(blocks[row], synd[row], ecc_count, erase_pos)
+        except ReedSolomonError:
+            counts[row] = -1
+    return blocks, counts
+
+def rs_decode(block: np.ndarray, ecc_count: int, erase_pos: list = None) -> tuple[np.ndarray, int]:
+    # single block convenience wrapper, raises instead of flagging the failure
+    corrected, counts = rs_decode_batch(np.asarray(block, dtype=np.uint8)[None, :], ecc_count,
+                                        None if erase_pos is None else [erase_pos])
+    if counts[0] < 0:
+        raise ReedSolomonError("Too many errors to correct")
+    return corrected[0, :-ecc_count], int(counts[0])
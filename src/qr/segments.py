@@ -0,0 +1,116 @@
+import qr.constants as constants
+import qr.layout as layout
+from qr.bitbuffer import BitBuffer
+
+# Splitting the payload into numeric, alphanumeric and byte segments
+
+class Segment:
+    def __init__(self, mode: str, text: str) -> None:
+        self.mode = mode
+        self.text = text
+        # byte segments count UTF-8 bytes, the others count characters
+        self.data = text.encode('utf-8') if mode == 'byte' else text
+        self.num_chars = len(self.data)
+
+    def __repr__(self) -> str:
+        return f"Segment({self.mode!r}, {self.text!r})"
+
+    def data_bits(self) -> int:
+        if self.mode == 'numeric':
+            return 10 * (self.num_chars // 3) + (0, 4, 7)[self.num_chars % 3]
+        if self.mode == 'alphanumeric':
+            return 11 * (self.num_chars // 2) + 6 * (self.num_chars % 2)
+        return 8 * self.num_chars
+
+    def total_bits(self, version: int) -> int:
+        count_bits = layout.char_count_bits(self.mode, version)
+        if self.num_chars >= 1 << count_bits:
+            # the character count doesn't fit in the count field
+            return None
+        return 4 + count_bits + self.data_bits()
+
+    def write(self, buffer: BitBuffer, version: int) -> None:
+        buffer.append_bits(constants.MODE_INDICATORS[self.mode], 4)
+        buffer.append_bits(self.num_chars, layout.char_count_bits(self.mode, version))
+
+        if self.mode == 'numeric':
+            # 3 digits → 10 bits, 2 digits → 7 bits, 1 digit → 4 bits
+            for i in range(0, self.num_chars, 3):
+                group = self.data[i:i + 3]
+                buffer.append_bits(int(group), (0, 4, 7, 10)[len(group)])
+        elif self.mode == 'alphanumeric':
+            # 2 characters → 11 bits, a last single one → 6 bits
+            table = constants.ALPHANUMERIC_CHARSET
+            for i in range(0, self.num_chars - 1, 2):
+                buffer.append_bits(table.index(self.data[i]) * 45 + table.index(self.data[i + 1]), 11)
+            if self.num_chars % 2:
+                buffer.append_bits(table.index(self.data[-1]), 6)
+        else:
+            buffer.append_bytes(self.data)
+
+def segments_bits(segments: list[Segment], version: int) -> int:
+    total = 0
+    for segment in segments:
+        bits = segment.total_bits(version)
+        if bits is None:
+            return None
+        total += bits
+    return total
+
+MODES = ('byte', 'alphanumeric', 'numeric')
+
+def optimal_segments(text: str, version: int) -> list[Segment]:
+    """
+    Split the text into segments with the minimum total bit length for the given version
+    (only the character count widths depend on it, so versions 1-9, 10-26 and 27-40 each
+    have a single answer).
+    Dynamic programming over the characters; costs are kept in sixths of a bit so that
+    alphanumeric (5.5 bits) and numeric (3.33 bits) characters stay integers.
+    """
+    if not text:
+        return []
+    head_costs = [(4 + layout.char_count_bits(mode, version)) * 6 for mode in MODES]
+
+    # char_modes[i][m]: mode character i is encoded in, on the cheapest path that is in mode m after it
+    char_modes = []
+    prev_costs = head_costs[:]
+    for ch in text:
+        costs = [None] * len(MODES)
+        modes = [None] * len(MODES)
+
+        costs[0] = prev_costs[0] + len(ch.encode('utf-8')) * 8 * 6
+        modes[0] = 'byte'
+        if ch in constants.ALPHANUMERIC_CHARSET:
+            costs[1] = prev_costs[1] + 33
+            modes[1] = 'alphanumeric'
+        if '0' <= ch <= '9':
+            costs[2] = prev_costs[2] + 20
+            modes[2] = 'numeric'
+
+        # switching modes after this character: round up to whole bits, then pay the new header
+        for to in range(len(MODES)):
+            for frm in range(len(MODES)):
+                if modes[frm] is None:
+                    continue
+                switched = (costs[frm] + 5) // 6 * 6 + head_costs[to]
+                if modes[to] is None or switched < costs[to]:
+                    costs[to] = switched
+                    modes[to] = MODES[frm]
+
+        char_modes.append(modes)
+        prev_costs = costs
+
+    # trace the cheapest path backwards
+    mode = MODES[min(range(len(MODES)), key=lambda m: prev_costs[m])]
+    per_char = [None] * len(text)
+    for i in range(len(text) - 1, -1, -1):
+        mode = char_modes[i][MODES.index(mode)]
+        per_char[i] = mode
+
+    segments = []
+    start = 0
+    for i in range(1, len(text) + 1):
+        if i == len(text) or per_char[i] != per_char[start]:
+            segments.append(Segment(per_char[start], text[start:i]))
+            start = i
+    return segments
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+import cv2
+import numpy as np
+from qr.decoder import locate_qr_codes, decode_symbol
+
+# Decoding a stream of frames (a video file, a camera or any iterable of images)
+
+def read_frames(source):
+    """
+    Yield the frames of a video file, a camera (its index, as an int or a digit string)
+    or an iterable of image arrays.
+    """
+    if isinstance(source, (str, int)):
+        capture = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+        if not capture.isOpened():
+            raise ValueError(f"Could not open the video source: {source}")
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                yield frame
+        finally:
+            capture.release()
+    else:
+        yield from source
+
+class StreamDecoder:
+    """
+    Decodes consecutive frames, tracking the QR codes it found: a code is looked for
+    again only in a window around its previous box (enlarged by `margin` of its size on
+    every side), and the whole frame is searched only when a code is lost, when nothing is
+    tracked, or every `redetect_every` frames to pick up new codes. Full frames skip the
+    whole-image finder search of locate_qr_codes, which finds nothing in most frames.
+    With dedupe, every payload is reported only the first time it is read; the `max_seen`
+    payloads read most recently are remembered.
+    """
+    def __init__(self, dedupe: bool = True, margin: float = 0.5, redetect_every: int = 30,
+                 max_seen: int = 1024) -> None:
+        self.dedupe = dedupe
+        self.margin = margin
+        self.redetect_every = redetect_every
+        self.max_seen = max_seen
+
+        self.tracks = []
+        self.seen = OrderedDict()
+        self.frames = 0
+        self.full_scans = 0
+        self.tracked_reads = 0
+
+    def read_window(self, gray: np.ndarray, box: tuple) -> dict:
+        # look for the code again around its previous box
+        x, y, w, h = box
+        mx, my = int(w * self.margin), int(h * self.margin)
+        x0, y0 = max(x - mx, 0), max(y - my, 0)
+        x1, y1 = min(x + w + mx, gray.shape[1]), min(y + h + my, gray.shape[0])
+
+        located = next(locate_qr_codes(gray[y0:y1, x0:x1], find_all=False), None)
+        if located is None:
+            return None
+        (bx, by, bw, bh), quad, qr_symbol = located
+        symbol = decode_symbol(qr_symbol)
+        if symbol['error'] is not None:
+            return None
+        symbol.update(box=(bx + x0, by + y0, bw, bh), quad=quad + [x0, y0], symbol=qr_symbol,
+                      version=qr_symbol.version, tracked=True)
+        return symbol
+
+    def read_frame(self, gray: np.ndarray) -> list[dict]:
+        # full detection
+        self.full_scans += 1
+        symbols = []
+        for box, quad, qr_symbol in locate_qr_codes(gray, fallback=False):
+            symbol = decode_symbol(qr_symbol)
+            if symbol['error'] is None:
+                symbol.update(box=box, quad=quad, symbol=qr_symbol, version=qr_symbol.version, tracked=False)
+                symbols.append(symbol)
+        return symbols
+
+    def process(self, frame: np.ndarray) -> list[dict]:
+        """
+        Decode one frame. Returns the symbols read in it (only the new payloads with dedupe);
+        besides the decode_symbol keys, each has 'frame', 'box', 'quad', 'symbol' (QRSymbol), 'version' and
+        'tracked' (found through tracking rather than a full detection).
+        """
+        index = self.frames
+        self.frames += 1
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        symbols = []
+        lost = not self.tracks
+        for box in self.tracks:
+            symbol = self.read_window(gray, box)
+            if symbol is None:
+                lost = True
+                break
+            symbols.append(symbol)
+
+        if lost or (self.redetect_every and index % self.redetect_every == 0):
+            symbols = self.read_frame(gray)
+        else:
+            self.tracked_reads += len(symbols)
+        self.tracks = [symbol['box'] for symbol in symbols]
+
+        for symbol in symbols:
+            symbol['frame'] = index
+        if self.dedupe:
+            symbols = [symbol for symbol in symbols if self.first_sight(symbol['text'])]
+        return symbols
+
+    def first_sight(self, text: str) -> bool:
+        # remember the payload (LRU, a payload still in view stays remembered); True if it is new
+        new = text not in self.seen
+        self.seen[text] = None
+        self.seen.move_to_end(text)
+        while len(self.seen) > self.max_seen:
+            self.seen.popitem(last=False)
+        return new
+
+def decode_stream(source, dedupe: bool = True, margin: float = 0.5, redetect_every: int = 30,
+                  max_seen: int = 1024):
+    """
+    Generator over the symbols read from a video file, camera or iterable of frames
+    (see StreamDecoder).
+    """
+    decoder = StreamDecoder(dedupe, margin, redetect_every, max_seen)
+    for frame in read_frames(source):
+        yield from decoder.process(frame)
@@ -0,0 +1,88 @@
+import numpy as np
+import qr.layout as layout
+
+# Compact, immutable QR symbol: the modules packed 8 per byte
+class QRSymbol:
+    """
+    The modules of a finished symbol, row by row, packed 8 per byte (1 = dark),
+    the same layout as the 'bits' output format. The function-pattern mask isn't stored
+    per symbol: it is shared by every symbol of the version (see function_mask).
+    Symbols compare and hash by version and modules, so they can be used as cache keys;
+    their attributes can't be assigned.
+    Conversions:
+      - builder matrix (uint8, 0 = black, 1 = white): from_matrix / to_matrix
+      - decoder grid (bool, True = white): from_grid / to_grid
+      - dark modules (bool, True = dark): from_dark / to_dark
+    """
+    __slots__ = ('version', 'size', 'bits', '_hash')
+
+    def __init__(self, version: int, bits: bytes) -> None:
+        if version not in range(1, 41):
+            raise ValueError(f"QR version must be between 1 and 40, got {version}")
+        size = layout.symbol_size(version)
+        if len(bits) != (size * size + 7) // 8:
+            raise ValueError(f"A version {version} symbol takes {(size * size + 7) // 8} bytes, got {len(bits)}")
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'size', size)
+        object.__setattr__(self, 'bits', bytes(bits))
+        object.__setattr__(self, '_hash', None)
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"QRSymbol is immutable, can't set {name!r}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"QRSymbol is immutable, can't delete {name!r}")
+
+    @staticmethod
+    def version_for_size(size: int) -> int:
+        version, rest = divmod(size - 17, 4)
+        if rest or version not in range(1, 41):
+            raise ValueError(f"{size}x{size} is not the size of a QR symbol")
+        return version
+
+    @classmethod
+    def from_dark(cls, dark: np.ndarray) -> 'QRSymbol':
+        dark = np.asarray(dark, dtype=bool)
+        return cls(cls.version_for_size(dark.shape[0]), np.packbits(dark).tobytes())
+
+    @classmethod
+    def from_matrix(cls, matrix: np.ndarray) -> 'QRSymbol':
+        return cls.from_dark(np.asarray(matrix) == 0)
+
+    @classmethod
+    def from_grid(cls, grid: np.ndarray) -> 'QRSymbol':
+        return cls.from_dark(~np.asarray(grid, dtype=bool))
+
+    def to_dark(self) -> np.ndarray:
+        bits = np.unpackbits(np.frombuffer(self.bits, dtype=np.uint8), count=self.size * self.size)
+        return bits.reshape(self.size, self.size).view(bool)
+
+    def to_matrix(self) -> np.ndarray:
+        return 1 - np.unpackbits(np.frombuffer(self.bits, dtype=np.uint8),
+                                 count=self.size * self.size).reshape(self.size, self.size)
+
+    def to_grid(self) -> np.ndarray:
+        return ~self.to_dark()
+
+    @property
+    def function_mask(self) -> np.ndarray:
+        # modules reserved for function patterns (shared, read-only)
+        return layout.reserved_mask(self.version)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, QRSymbol):
+            return NotImplemented
+        return self.version == other.version and self.bits == other.bits
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            # computed once, on first use
+            object.__setattr__(self, '_hash', hash((self.version, self.bits)))
+        return self._hash
+
+    def __repr__(self) -> str:
+        return f"QRSymbol(version={self.version}, {self.size}x{self.size})"
@@ -1,51 +1,127 @@
+import io
 from PIL import Image
 from qr.builder import QRCodeBuilder
 import numpy as np
 import qr.constants as constants
 
+# color of every builder matrix value: 0 = black, 1 = white, 2 = format, 3 = debug, 4 = free
+PALETTE = np.array([constants.BLACK, constants.WHITE, constants.BLUE, constants.RED, constants.NEUTRAL], dtype=np.uint8)
+
+# output formats and their file extensions:
+#   rgb  - RGB PNG with the debug colors, img_size x img_size
+#   mono - 1-bit PNG (palette PNG if debug colors are present) at exact module scale
+#   svg  - SVG, the dark modules of every row merged into horizontal runs
+#   bits - the modules without quiet zone, row by row, packed 8 per byte (1 = dark)
+OUTPUT_FORMATS = {'rgb': 'png', 'mono': 'png', 'svg': 'svg', 'bits': 'bin'}
+
 class QR_Visualizer:
-    def __init__(self, qr: QRCodeBuilder):
+    def __init__(self, qr: QRCodeBuilder, img_size: int = None, module_size: int = None, quiet_zone: int = 1):
+        """
+        By default the image is 864px and the modules are as large as fit in it;
+        given only module_size, the image is exactly as large as the symbol plus its quiet zone.
+        """
         self.qr = qr
 
-        self.qr_size: int = 27
-        self.img_size: int = 864
-        self.module_size: int = self.img_size // self.qr_size
+        # symbol plus a quiet zone of white modules on each side
+        self.n: int = qr.get_matrix().shape[0]
+        self.quiet_zone: int = quiet_zone
+        self.qr_size: int = self.n + 2 * quiet_zone
+        if img_size is None:
+            img_size = 864 if module_size is None else module_size * self.qr_size
+        if module_size is None:
+            module_size = img_size // self.qr_size
+        if module_size < 1 or module_size * self.qr_size > img_size:
+            raise ValueError(f"A {self.qr_size}x{self.qr_size} module QR code doesn't fit in {img_size}px "
+                             f"with {module_size}px modules")
+        self.img_size: int = img_size
+        self.module_size: int = module_size
+
+        self.img: Image.Image = None
+
+    def render(self) -> np.ndarray:
+        """
+        RGB pixels of the image: the matrix goes through the palette, then every module
+        is blown up to module_size x module_size pixels at once.
+        """
+        modules = self.scale_modules(PALETTE[self.padded_matrix()])
+
+        # the symbol sits in the top left corner, the leftover pixels stay white
+        pixels = np.full((self.img_size, self.img_size, 3), 255, dtype=np.uint8)
+        pixels[:modules.shape[0], :modules.shape[1]] = modules
+        return pixels
+
+    def padded_matrix(self) -> np.ndarray:
+        return np.pad(np.asarray(self.qr.get_matrix()), self.quiet_zone, constant_values=1)
 
-        self.img: Image.Image = Image.new('RGB', (self.img_size, self.img_size), constants.WHITE)
-        self.image_pixels = self.img.load()
+    def scale_modules(self, modules: np.ndarray) -> np.ndarray:
+        return modules.repeat(self.module_size, axis=0).repeat(self.module_size, axis=1)
 
-    def fill_module(self, row: int, col: int, color=constants.BLACK) -> None:
-        ms = self.module_size
-        for i in range(col * ms, col * ms + ms):
-            for j in range(row * ms, row * ms + ms):
-                self.image_pixels[i, j] = color
+    def to_mono_image(self) -> Image.Image:
+        matrix = self.padded_matrix()
+        if matrix.max() <= 1:
+            return Image.fromarray(self.scale_modules(matrix.astype(bool)))
+        # debug colors: a palette image instead
+        img = Image.fromarray(self.scale_modules(matrix.astype(np.uint8)), 'P')
+        img.putpalette(PALETTE.tobytes())
+        return img
+
+    def to_svg(self) -> str:
+        """
+        One path with a rectangle per horizontal run of dark modules, in module units.
+        """
+        dark = np.pad(np.asarray(self.qr.get_matrix()) == 0, ((0, 0), (1, 1)))
+        # +1 where a run starts, -1 one past its end; both are found in row-major order
+        edges = np.diff(dark.astype(np.int8), axis=1)
+        rows, starts = np.nonzero(edges == 1)
+        ends = np.nonzero(edges == -1)[1]
+
+        q = self.quiet_zone
+        path = ''.join(f'M{c + q},{r + q}h{n}v1h-{n}z' for r, c, n in zip(rows, starts, ends - starts))
+        size = self.qr_size
+        return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" '
+                f'width="{size * self.module_size}" height="{size * self.module_size}" shape-rendering="crispEdges">'
+                f'<rect width="{size}" height="{size}" fill="#fff"/><path d="{path}" fill="#000"/></svg>\n')
+
+    def to_bits(self) -> bytes:
+        return np.packbits(np.asarray(self.qr.get_matrix()) == 0).tobytes()
+
+    def to_bytes(self, output: str = 'rgb') -> bytes:
+        if output == 'svg':
+            return self.to_svg().encode('utf-8')
+        if output == 'bits':
+            return self.to_bits()
+        if output == 'mono':
+            img = self.to_mono_image()
+        elif output == 'rgb':
+            self.write_image()
+            img = self.img
+        else:
+            raise ValueError(f"Unknown output format: {output!r}, expected one of {', '.join(OUTPUT_FORMATS)}")
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG')
+        return buffer.getvalue()
 
     def write_image(self) -> None:
-        matrix = self.qr.get_matrix()
-        for i in range(26):
-            for j in range(26):
-                self.fill_module(i, j, (255, 255, 255))
-        for i in range(1,26):
-            for j in range(1, 26):
-                color_map = {0: constants.BLACK, 1: constants.WHITE, 2: constants.BLUE, 3: constants.RED, 4: constants.NEUTRAL}
-                color = color_map.get(matrix[i-1][j-1])
-                self.fill_module(i, j, color)
+        self.img = Image.fromarray(self.render(), 'RGB')
 
     def show_image(self) -> None:
         self.write_image()
         self.img.show()
 
-    def save_image(self, filename: str = 'qr_code.png', format: str = 'PNG', path: str = '.') -> None:
-        self.write_image()
+    def save_image(self, filename: str = 'qr_code.png', format: str = 'PNG', path: str = '.', output: str = 'rgb') -> None:
         full_path = f"{path}/{filename}"
-        self.img.save(full_path, format=format)
+        if output == 'rgb':
+            self.write_image()
+            self.img.save(full_path, format=format)
+            return
+        with open(full_path, 'wb') as f:
+            f.write(self.to_bytes(output))
 
     def qr_to_terminal(self) -> str:
         matrix = np.array(self.qr.get_matrix())
-        quiet_zone = 1
 
         # Pad the matrix using numpy.pad to add a quiet zone
-        padded_matrix = np.pad(matrix, pad_width=quiet_zone, mode='constant', constant_values=1)
+        padded_matrix = np.pad(matrix, pad_width=self.quiet_zone, mode='constant', constant_values=1)
 
         # Build the string representation
         # Each cell is mapped to a block: '██' if non-zero, else '  '
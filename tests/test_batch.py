@@ -0,0 +1,34 @@
+import pytest
+from qr.batch import decode_batch, decode_job
+from qr.decoder import decode_data
+from qr.encoder import encode_bytes
+
+# Batch decoding: an image the decoder fails on is reported in its record, the others still decode
+
+def bits_to_codewords(bits: str) -> bytes:
+    bits += '0' * (-len(bits) % 8)
+    return bytes(int(bits[i:i+8], 2) for i in range(0, len(bits), 8))
+
+@pytest.mark.parametrize("bits, message", [
+    ('0010' + f'{2:09b}' + f'{2047:011b}', "Invalid alphanumeric value 2047"),
+    ('0010' + f'{1:09b}' + f'{50:06b}', "Invalid alphanumeric value 50"),
+    ('0001' + f'{3:010b}' + f'{1000:010b}', "Invalid numeric value 1000"),
+])
+def test_invalid_values(bits, message):
+    with pytest.raises(ValueError, match=message):
+        decode_data(bits_to_codewords(bits))
+
+def test_unreadable_images(tmp_path):
+    empty, garbage, good = tmp_path / 'empty.png', tmp_path / 'garbage.png', tmp_path / 'good.png'
+    empty.write_bytes(b'')
+    garbage.write_bytes(b'not an image')
+    good.write_bytes(encode_bytes('BATCH-1', 'rgb'))
+
+    for path in (empty, garbage, tmp_path / 'missing.png'):
+        record = decode_job(str(path))
+        assert record['payload'] is None
+        assert record['error'] == "Could not read the image"
+
+    paths = [str(empty), str(good)]
+    records = list(decode_batch(paths, workers=2, cache_dir=str(tmp_path / 'cache')))
+    assert {record['path']: record['payload'] for record in records} == {str(empty): None, str(good): 'BATCH-1'}
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+from qr.cache import DecodeCache, image_symbols
+from qr.encoder import encode_bytes
+
+# Cached decoding: results by image content, in memory then on disk
+
+def test_tiers(tmp_path):
+    png = encode_bytes('CACHE-3', 'rgb')
+    cache = DecodeCache(str(tmp_path))
+    symbols, tier = image_symbols(png, cache)
+    assert [symbol['text'] for symbol in symbols] == ['CACHE-3']
+    assert tier == 'miss'
+    assert image_symbols(png, cache) == (symbols, 'memory')
+    # a new process: only the disk tier is left
+    assert image_symbols(png, DecodeCache(str(tmp_path))) == (symbols, 'disk')
+
+@pytest.mark.parametrize("source", [b'', np.zeros((0, 0, 3), dtype=np.uint8)])
+def test_empty_image(tmp_path, source):
+    cache = DecodeCache(str(tmp_path))
+    for c in (None, cache):
+        with pytest.raises(ValueError, match="Could not read the image"):
+            image_symbols(source, c)
+    assert cache.stats['misses'] == 0
+    assert cache.stats['memory_entries'] == 0
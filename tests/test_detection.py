@@ -0,0 +1,29 @@
+import cv2
+import numpy as np
+import pytest
+from qr.decoder import detect_qr_codes, detection_levels
+from qr.encoder import encode_bytes
+
+# Detection of small codes in large frames: the pyramid search has to reach fine enough levels
+
+def frame(text: str, module_size: int, background: int, seed: int = 0) -> np.ndarray:
+    # a 12 MP grayscale frame: the code (with its quiet zone) on a flat background, plus noise
+    code = cv2.imdecode(np.frombuffer(encode_bytes(text, 'mono', module_size=module_size, quiet_zone=4),
+                                      dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    image = np.full((3000, 4000), background, dtype=np.float32)
+    h, w = code.shape
+    image[1200:1200 + h, 2300:2300 + w] = code
+    image += np.random.default_rng(seed).normal(0, 8, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+def test_detection_levels():
+    assert detection_levels(np.zeros((3000, 4000))) == [(500, 8), (1000, 4), (2000, 2)]
+    assert detection_levels(np.zeros((480, 640))) == [(640, 1)]
+
+@pytest.mark.parametrize("module_size, background", [(4, 180), (4, 100), (6, 100), (10, 180)])
+def test_small_code_in_large_frame(module_size, background):
+    symbols = detect_qr_codes(frame('LABEL-42', module_size, background))[0]
+    assert [symbol['text'] for symbol in symbols] == ['LABEL-42']
+
+def test_frame_without_code():
+    assert detect_qr_codes(np.full((3000, 4000), 150, dtype=np.uint8))[0] == []
@@ -0,0 +1,36 @@
+import cv2
+import numpy as np
+import pytest
+from qr.decoder import find_qr_in_image, full_decode, load_image
+from qr.encoder import encode_bytes
+
+# Reading images: every accepted input becomes a uint8 BGR array, anything else raises ValueError
+
+def code(text: str = 'LOAD-7') -> np.ndarray:
+    return cv2.imdecode(np.frombuffer(encode_bytes(text, 'mono'), dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+
+@pytest.mark.parametrize("convert", [
+    lambda gray: gray,
+    lambda gray: gray[:, :, None],
+    lambda gray: cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR),
+    lambda gray: cv2.cvtColor(gray, cv2.COLOR_GRAY2BGRA),
+    lambda gray: gray.astype(np.float64),
+    lambda gray: cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR).astype(np.float64),
+    lambda gray: cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR).astype(np.uint16),
+])
+def test_arrays(convert):
+    gray = code()
+    image = load_image(convert(gray))
+    assert image.dtype == np.uint8
+    assert image.shape == (*gray.shape, 3)
+    assert full_decode(find_qr_in_image(image, find_all=True)[0]) == 'LOAD-7'
+
+@pytest.mark.parametrize("source", [b'', b'not an image', np.zeros((0, 0)), np.zeros((4, 4, 2)), np.zeros(16)])
+def test_unreadable(source):
+    with pytest.raises(ValueError, match="Could not read the image"):
+        load_image(source)
+
+def test_no_code_reported_once(capsys):
+    blank = np.full((200, 200), 255, dtype=np.uint8)
+    assert full_decode(find_qr_in_image(blank, find_all=True)[0]) == "No QR code found."
+    assert capsys.readouterr().out == ''
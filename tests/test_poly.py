@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from qr.poly import ReedSolomonError, rs_decode, rs_decode_batch, rs_encode_batch
+
+# Reed-Solomon decoding: errors, erasures and blocks beyond repair
+
+# (data codewords, ECC codewords): block shapes used by QR codes
+SHAPES = [(19, 7), (16, 10), (13, 13), (9, 17), (43, 26), (15, 30)]
+
+def codewords(count: int, k: int, ecc_count: int, seed: int) -> np.ndarray:
+    # `count` random data blocks with their ECC codewords appended
+    data = np.random.default_rng(seed).integers(0, 256, (count, k), dtype=np.uint8)
+    return np.hstack([data, rs_encode_batch(data, ecc_count)])
+
+def corrupt(block: np.ndarray, positions: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    # xor every position with a nonzero value, so every one really is wrong
+    received = block.copy()
+    received[positions] ^= rng.integers(1, 256, len(positions), dtype=np.uint8)
+    return received
+
+@pytest.mark.parametrize("k, ecc_count", SHAPES)
+def test_clean_blocks(k, ecc_count):
+    blocks = codewords(8, k, ecc_count, seed=k)
+    corrected, counts = rs_decode_batch(blocks, ecc_count)
+    assert np.array_equal(corrected, blocks)
+    assert (counts == 0).all()
+
+@pytest.mark.parametrize("k, ecc_count", SHAPES)
+def test_up_to_t_errors(k, ecc_count):
+    rng = np.random.default_rng(ecc_count)
+    blocks = codewords(8, k, ecc_count, seed=k)
+    n, t = k + ecc_count, ecc_count // 2
+    for errors in range(1, t + 1):
+        received = np.array([corrupt(block, rng.choice(n, errors, replace=False), rng) for block in blocks])
+        corrected, counts = rs_decode_batch(received, ecc_count)
+        assert np.array_equal(corrected, blocks)
+        assert (counts == errors).all()
+
+@pytest.mark.parametrize("k, ecc_count", SHAPES)
+def test_up_to_2t_erasures(k, ecc_count):
+    rng = np.random.default_rng(ecc_count)
+    blocks = codewords(8, k, ecc_count, seed=k)
+    n = k + ecc_count
+    for erased in (1, ecc_count // 2, ecc_count):
+        positions = [rng.choice(n, erased, replace=False) for _ in blocks]
+        received = np.array([corrupt(block, pos, rng) for block, pos in zip(blocks, positions)])
+        corrected, counts = rs_decode_batch(received, ecc_count, erasures=positions)
+        assert np.array_equal(corrected, blocks)
+        assert (counts >= 0).all()
+
+@pytest.mark.parametrize("k, ecc_count", SHAPES)
+def test_errors_and_erasures(k, ecc_count):
+    # 2 * errors + erasures <= ecc_count
+    rng = np.random.default_rng(ecc_count)
+    blocks = codewords(8, k, ecc_count, seed=k)
+    n = k + ecc_count
+    for errors in range(1, ecc_count // 2 + 1):
+        erased = ecc_count - 2 * errors
+        received, erasures = [], []
+        for block in blocks:
+            positions = rng.choice(n, errors + erased, replace=False)
+            received.append(corrupt(block, positions, rng))
+            erasures.append(positions[errors:])
+        corrected, counts = rs_decode_batch(np.array(received), ecc_count, erasures=erasures)
+        assert np.array_equal(corrected, blocks)
+        assert (counts >= errors).all()
+
+def test_too_many_errors():
+    k, ecc_count = 19, 7
+    rng = np.random.default_rng(1)
+    block = codewords(1, k, ecc_count, seed=1)[0]
+    received = corrupt(block, rng.choice(k + ecc_count, 6, replace=False), rng)
+    corrected, counts = rs_decode_batch(received[None], ecc_count)
+    assert counts[0] == -1
+    assert np.array_equal(corrected[0], received)
+
+def test_too_many_erasures():
+    k, ecc_count = 16, 10
+    block = codewords(1, k, ecc_count, seed=2)[0]
+    _, counts = rs_decode_batch(block[None], ecc_count, erasures=[range(ecc_count + 1)])
+    assert counts[0] == -1
+
+def test_failed_block_leaves_the_others():
+    k, ecc_count = 43, 26
+    rng = np.random.default_rng(3)
+    blocks = codewords(3, k, ecc_count, seed=3)
+    received = blocks.copy()
+    received[1] = corrupt(blocks[1], rng.choice(k + ecc_count, 5, replace=False), rng)
+    received[2] = corrupt(blocks[2], rng.choice(k + ecc_count, 20, replace=False), rng)
+    corrected, counts = rs_decode_batch(received, ecc_count)
+    assert list(counts) == [0, 5, -1]
+    assert np.array_equal(corrected[:2], blocks[:2])
+
+def test_rs_decode_single_block():
+    k, ecc_count = 13, 13
+    rng = np.random.default_rng(4)
+    block = codewords(1, k, ecc_count, seed=4)[0]
+    data, count = rs_decode(corrupt(block, np.array([0, 5, 20]), rng), ecc_count)
+    assert np.array_equal(data, block[:k])
+    assert count == 3
+    with pytest.raises(ReedSolomonError):
+        rs_decode(corrupt(block, rng.choice(k + ecc_count, 12, replace=False), rng), ecc_count)